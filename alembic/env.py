@@ -5,7 +5,7 @@ from alembic import context
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from src.app.core.config import settings
-from src.app.core.database import Base
+from src.app.core.database import Base, shard_url
 
 from src.app.task.models import Task
 
@@ -30,6 +30,11 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # FTS5 virtual tables and their shadow tables are managed by hand-written migrations
+    return not (type_ == "table" and name.startswith("tasks_fts"))
+
+
 def run_migrations_offline():
     url = settings.DATABASE_URL
     context.configure(
@@ -37,6 +42,7 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -45,20 +51,28 @@ def run_migrations_offline():
 
 def do_run_migrations(connection):
     context.configure(
-        connection=connection, target_metadata=target_metadata
+        connection=connection, target_metadata=target_metadata, include_object=include_object
     )
 
     with context.begin_transaction():
         context.run_migrations()
 
 
+def shard_urls():
+    # Every shard has the same schema: "-x shard=N" picks one, by default all of them are migrated
+    shard = context.get_x_argument(as_dictionary=True).get("shard")
+    shards = range(settings.DATABASE_SHARDS) if shard is None else [int(shard)]
+    return [shard_url(settings.DATABASE_URL, shard) for shard in shards]
+
+
 async def run_migrations_online():
-    connectable = create_async_engine(settings.DATABASE_URL)
+    for url in shard_urls():
+        connectable = create_async_engine(url)
 
-    async with connectable.connect() as connection:
-        await connection.run_sync(do_run_migrations)
+        async with connectable.connect() as connection:
+            await connection.run_sync(do_run_migrations)
 
-    await connectable.dispose()
+        await connectable.dispose()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,59 @@
+"""Add tasks full-text search
+
+Revision ID: 7c1d4e9a2b35
+Revises: 2609909bc456
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d4e9a2b35'
+down_revision: Union[str, None] = '2609909bc456'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # External content table: the index stores only tokens, rows are read from tasks
+    op.execute("""
+        CREATE VIRTUAL TABLE tasks_fts USING fts5(
+            title,
+            description,
+            content='tasks',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """)
+    op.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS tasks_fts_insert")
+    op.execute("DROP TABLE IF EXISTS tasks_fts")
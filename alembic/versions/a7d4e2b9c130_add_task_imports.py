@@ -0,0 +1,35 @@
+"""Add task imports
+
+Revision ID: a7d4e2b9c130
+Revises: f3c8a1d95b27
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e2b9c130'
+down_revision: Union[str, None] = 'f3c8a1d95b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_imports',
+        sa.Column('source', sa.String(length=1024), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('line', sa.Integer(), nullable=False),
+        sa.Column('imported', sa.Integer(), nullable=False),
+        sa.Column('rejected', sa.Integer(), nullable=False),
+        sa.Column('rejects_position', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('task_imports')
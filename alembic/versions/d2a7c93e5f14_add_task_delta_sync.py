@@ -0,0 +1,81 @@
+"""Add task delta sync
+
+Revision ID: d2a7c93e5f14
+Revises: b4e8f2c61d07
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7c93e5f14'
+down_revision: Union[str, None] = 'b4e8f2c61d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Takes the next number from task_sync_state. SQLite has a single writer, so
+# sequence numbers become visible to readers in the order they were handed out
+NEXT_CHANGE_SEQ = "UPDATE task_sync_state SET change_seq = change_seq + 1 WHERE id = 1;"
+CURRENT_CHANGE_SEQ = "(SELECT change_seq FROM task_sync_state WHERE id = 1)"
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('change_seq', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.create_table(
+        'task_tombstones',
+        sa.Column('task_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index('ix_task_tombstones_change_seq', 'task_tombstones', ['change_seq'], unique=False)
+    op.create_table(
+        'task_sync_state',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('compacted_seq', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Existing tasks count as changed in id order
+    op.execute("UPDATE tasks SET change_seq = id")
+    op.execute("INSERT INTO task_sync_state (id, change_seq, compacted_seq) SELECT 1, COALESCE(MAX(id), 0), 0 FROM tasks")
+    op.create_index('ix_tasks_change_seq', 'tasks', ['change_seq'], unique=False)
+
+    # A re-used id is a live task again, so it never has both a row and a tombstone
+    op.execute(f"""
+        CREATE TRIGGER tasks_change_seq_insert AFTER INSERT ON tasks BEGIN
+            {NEXT_CHANGE_SEQ}
+            UPDATE tasks SET change_seq = {CURRENT_CHANGE_SEQ} WHERE id = new.id;
+            DELETE FROM task_tombstones WHERE task_id = new.id;
+        END
+    """)
+    # change_seq is not in the column list, so the trigger's own update doesn't fire it again
+    op.execute(f"""
+        CREATE TRIGGER tasks_change_seq_update AFTER UPDATE OF title, description, updated_at ON tasks BEGIN
+            {NEXT_CHANGE_SEQ}
+            UPDATE tasks SET change_seq = {CURRENT_CHANGE_SEQ} WHERE id = new.id;
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER tasks_tombstone AFTER DELETE ON tasks BEGIN
+            {NEXT_CHANGE_SEQ}
+            INSERT OR REPLACE INTO task_tombstones (task_id, change_seq)
+            VALUES (old.id, {CURRENT_CHANGE_SEQ});
+        END
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS tasks_tombstone")
+    op.execute("DROP TRIGGER IF EXISTS tasks_change_seq_update")
+    op.execute("DROP TRIGGER IF EXISTS tasks_change_seq_insert")
+    op.drop_index('ix_tasks_change_seq', table_name='tasks')
+    op.drop_table('task_sync_state')
+    op.drop_index('ix_task_tombstones_change_seq', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    op.drop_column('tasks', 'change_seq')
@@ -0,0 +1,32 @@
+"""Add task id sequence
+
+Revision ID: f3c8a1d95b27
+Revises: d2a7c93e5f14
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d95b27'
+down_revision: Union[str, None] = 'd2a7c93e5f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'task_id_sequence',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO task_id_sequence (id, last_id) SELECT 1, COALESCE(MAX(id), 0) FROM tasks")
+
+
+def downgrade() -> None:
+    op.drop_table('task_id_sequence')
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ("report", "deploy", "review", "meeting", "invoice", "backup", "release", "design", "budget", "hiring")
+
+RequestFactory = typing.Callable[[int], typing.Dict[str, typing.Any]]
+
+
+class Endpoint(typing.NamedTuple):
+    name: str
+    method: str
+    request: RequestFactory
+    # Fraction of --requests to send, heavy endpoints get fewer calls
+    share: float = 1.0
+    expected: typing.Tuple[int, ...] = (200,)
+
+
+def seed(path: str, count: int) -> None:
+    # The FTS triggers from the migrations index the rows as they are inserted
+    started_at = datetime(2025, 1, 1)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(
+            "INSERT INTO tasks (title, description, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    f"Task {i} {WORDS[i % len(WORDS)]}",
+                    f"Prepare the {WORDS[(i * 7) % len(WORDS)]} for week {i % 52}. " * 4,
+                    str(started_at + timedelta(minutes=i)),
+                    str(started_at + timedelta(minutes=i, seconds=i % 3600)),
+                )
+                for i in range(count)
+            ),
+        )
+    connection.close()
+
+
+def build_endpoints(tasks: int, etags: typing.Dict[str, str]) -> typing.List[Endpoint]:
+    def task_id(i: int) -> int:
+        return random.randint(1, tasks)
+
+    # Deletes walk down from the last seeded id, so every request removes a task that still exists
+    def deleted_id(i: int) -> int:
+        return tasks - i
+
+    def deleted_ids(i: int) -> typing.List[int]:
+        first = tasks // 2 - i * 10
+        return list(range(first, first - 10, -1))
+
+    new_task = {"title": "Benchmark task", "description": "Created by the load benchmark"}
+    return [
+        Endpoint("list", "GET", lambda i: {"url": "/tasks/", "params": {"limit": 100}}),
+        Endpoint("list_sorted", "GET", lambda i: {"url": "/tasks/", "params": {"limit": 100, "sort": "-updated_at"}}),
+        Endpoint("list_fields", "GET", lambda i: {"url": "/tasks/", "params": {"limit": 100, "fields": "id,title"}}),
+        Endpoint("list_msgpack", "GET", lambda i: {
+            "url": "/tasks/", "params": {"limit": 100}, "headers": {"Accept": "application/msgpack"},
+        }),
+        Endpoint("list_gzip", "GET", lambda i: {
+            "url": "/tasks/", "params": {"limit": 100}, "headers": {"Accept-Encoding": "gzip"},
+        }),
+        Endpoint("list_not_modified", "GET", lambda i: {
+            "url": "/tasks/", "params": {"limit": 100}, "headers": {"If-None-Match": etags["list"]},
+        }, expected=(304,)),
+        Endpoint("get", "GET", lambda i: {"url": f"/tasks/{task_id(i)}"}),
+        Endpoint("get_fields", "GET", lambda i: {"url": f"/tasks/{task_id(i)}", "params": {"fields": "id,title"}}),
+        Endpoint("get_not_modified", "GET", lambda i: {
+            "url": "/tasks/1", "headers": {"If-None-Match": etags["get"]},
+        }, expected=(304,)),
+        Endpoint("search", "GET", lambda i: {
+            "url": "/tasks/search", "params": {"q": WORDS[i % len(WORDS)], "limit": 20},
+        }),
+        Endpoint("search_snippets", "GET", lambda i: {
+            "url": "/tasks/search", "params": {"q": WORDS[i % len(WORDS)], "limit": 20, "snippets": True},
+        }),
+        Endpoint("export", "GET", lambda i: {"url": "/tasks/export"}, share=0.02),
+        Endpoint("health", "GET", lambda i: {"url": "/"}),
+        Endpoint("create", "POST", lambda i: {"url": "/tasks/create", "json": new_task}, expected=(201,)),
+        Endpoint("create_bulk", "POST", lambda i: {"url": "/tasks/bulk", "json": [new_task] * 100},
+                 share=0.2, expected=(201,)),
+        Endpoint("update", "PUT", lambda i: {
+            "url": f"/tasks/update/{task_id(i)}", "json": {"title": f"Updated {i}", "description": "Updated"},
+        }),
+        Endpoint("update_bulk", "PUT", lambda i: {
+            "url": "/tasks/bulk",
+            "json": [{"id": task_id(i), "title": f"Updated {i}", "description": "Updated"} for _ in range(100)],
+        }, share=0.2),
+        Endpoint("delete", "DELETE", lambda i: {"url": f"/tasks/delete/{deleted_id(i)}"}, expected=(204,)),
+        Endpoint("delete_bulk", "DELETE", lambda i: {"url": "/tasks/bulk", "json": {"ids": deleted_ids(i)}},
+                 share=0.2),
+    ]
+
+
+def percentile(samples: typing.List[float], fraction: float) -> float:
+    # Nearest-rank percentile of sorted samples
+    index = max(0, min(len(samples) - 1, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+async def drive(
+        client: httpx.AsyncClient,
+        endpoint: Endpoint,
+        requests: int,
+        concurrency: int,
+) -> typing.Dict[str, typing.Any]:
+    latencies: typing.List[float] = []
+    errors: typing.Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            request = endpoint.request(i)
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(endpoint.method, **request)
+                await response.aread()
+                outcome = None if response.status_code in endpoint.expected else str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latencies.append(time.perf_counter() - started_at)
+            if outcome is not None:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        lifespan = None
+    else:
+        # Imported only now: settings are read at import time and must see the benchmark database
+        from main import create_app
+
+        app = create_app()
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+
+    results = {}
+    try:
+        etags = {
+            "list": (await client.get("/tasks/", params={"limit": 100})).headers["etag"],
+            "get": (await client.get("/tasks/1")).headers["etag"],
+        }
+        for endpoint in build_endpoints(args.tasks, etags):
+            if args.endpoints and endpoint.name not in args.endpoints:
+                continue
+            requests = max(1, int(args.requests * endpoint.share))
+            results[endpoint.name] = await drive(client, endpoint, requests, args.concurrency)
+            print(format_row(endpoint.name, results[endpoint.name]), flush=True)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    return results
+
+
+def format_row(name: str, result: typing.Dict[str, typing.Any]) -> str:
+    errors = sum(result["errors"].values())
+    return (
+        f"{name:<20} {result['throughput_rps']:>10.1f} rps "
+        f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+        + (f"  errors {errors}" if errors else "")
+    )
+
+
+def compare(
+        results: typing.Dict[str, typing.Any],
+        baseline: typing.Dict[str, typing.Any],
+        threshold: float,
+) -> typing.List[str]:
+    regressions = []
+    for name, result in results["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if base is None:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']:.1f} rps < baseline {base['throughput_rps']:.1f} rps"
+            )
+        for metric in ("p95_ms", "p99_ms"):
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {result[metric]:.2f} > baseline {base[metric]:.2f}")
+        if sum(result["errors"].values()) > sum(base["errors"].values()):
+            regressions.append(f"{name}: errors {result['errors']} (baseline {base['errors']})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load benchmark for the task API")
+    parser.add_argument("--tasks", type=int, default=10000, help="Tasks seeded before the run")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--endpoints", nargs="*", help="Only run these endpoints")
+    parser.add_argument("--url", help="Benchmark a running server instead of an in-process app (seed it yourself)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed regression, 0.15 = 15%%")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.url:
+            database = os.path.join(directory, "benchmark.db")
+            os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+            os.environ.setdefault("LOG_LEVEL", "WARNING")
+            subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True,
+                           capture_output=True)
+            seed(database, args.tasks)
+
+        endpoints = asyncio.run(run(args))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "tasks": args.tasks,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "target": args.url or "in-process",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "endpoints": endpoints,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import typing
+from datetime import datetime
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app.core.config import settings
+from src.app.core.database import Base
+from src.app.core.mapper import DTOMapper
+from src.app.task.models import Task
+from src.app.task.repository import TaskRepository
+from src.app.task.schemas import TaskResponse
+
+# What FastAPI does with response_model=List[TaskResponse]: validate the returned list, then dump it
+response_adapter = TypeAdapter(typing.List[TaskResponse])
+
+
+async def model_path(session: AsyncSession, size: int) -> bytes:
+    result = await session.execute(select(Task).order_by(Task.id).limit(size))
+    responses = DTOMapper.tasks_to_responses(result.scalars().all())
+    return response_adapter.dump_json(response_adapter.validate_python(responses))
+
+
+async def fast_path(session: AsyncSession, size: int) -> bytes:
+    rows = await TaskRepository(session).get_page(size)
+    return DTOMapper.rows_to_json(rows)
+
+
+async def seed(session: AsyncSession, count: int) -> None:
+    now = datetime.now(settings.TIMEZONE)
+    for start in range(0, count, 10000):
+        await session.execute(insert(Task), [
+            {"title": f"Task {i}", "description": f"Description for task {i}", "created_at": now, "updated_at": now}
+            for i in range(start, min(start + 10000, count))
+        ])
+    await session.commit()
+
+
+async def measure(session: AsyncSession, path, size: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        session.expunge_all()
+        started_at = time.perf_counter()
+        await path(session, size)
+        best = min(best, time.perf_counter() - started_at)
+    return size / best
+
+
+async def main(sizes: typing.List[int], repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/benchmark.db")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await seed(session, max(sizes))
+            assert await model_path(session, 10) == await fast_path(session, 10)
+
+            print(f"{'rows':>8} {'model rows/s':>14} {'fast rows/s':>14} {'speedup':>8}")
+            for size in sizes:
+                before = await measure(session, model_path, size, repeat)
+                after = await measure(session, fast_path, size, repeat)
+                print(f"{size:>8} {before:>14,.0f} {after:>14,.0f} {after / before:>7.1f}x")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare task list serialization paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
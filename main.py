@@ -1,48 +1,124 @@
+import asyncio
+import logging
+import signal
+import threading
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from src.app.core import admission
 from src.app.core.config import settings
-from src.app.core.logging import logger
+from src.app.core.database import dispose_engines, pool_saturated, warm_up_engines
+from src.app.core.logging import get_logger, logging_stats
+from src.app.core.metrics import MetricsMiddleware, metrics
+from src.app.dependencies import change_feed, read_coalescer, task_cache, write_coalescers
 from src.app.task.controller import router as tasks_router
 import time
 
+logger = get_logger("http")
+
+
+def _close_change_feed_on_exit() -> None:
+    # Change feed streams never finish on their own and would hold a graceful shutdown
+    # until its timeout. They are ended as soon as the server is told to stop, so
+    # clients reconnect to another worker right away
+    if change_feed is None or threading.current_thread() is not threading.main_thread():
+        return
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        server_handler = signal.getsignal(sig)
+        if not callable(server_handler):
+            continue
+
+        def handler(signum, frame, server_handler=server_handler):
+            loop.call_soon_threadsafe(change_feed.close)
+            server_handler(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pools = await warm_up_engines()
+    logger.info("Connection pools warmed up: %s", pools, extra={"pools": pools})
+    _close_change_feed_on_exit()
+    yield
+    # The server has stopped accepting connections and drained in-flight requests by now
+    if change_feed is not None:
+        change_feed.close()
+    for write_coalescer in write_coalescers:
+        await write_coalescer.close()
+    await dispose_engines()
+
 
 def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.APP_TITLE,
         description=settings.APP_DESCRIPTION,
         version=settings.APP_VERSION,
+        lifespan=lifespan,
     )
 
+    # The middleware added last runs first: CORS wraps admission, so shed responses carry the CORS headers
+    if settings.ADMISSION_CONTROL_ENABLED:
+        app.add_middleware(
+            admission.AdmissionMiddleware,
+            read=admission.read_limiter,
+            write=admission.write_limiter,
+            routes=admission.route_limiters,
+            saturated=pool_saturated,
+            # The change feed holds its connection open, it is limited by CHANGE_FEED_MAX_SUBSCRIBERS instead
+            exempt=("/", "/metrics", "/tasks/events"),
+            retry_after=settings.ADMISSION_RETRY_AFTER,
+        )
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Link", "X-Next-Cursor", "ETag", "Last-Modified", "Retry-After"],
     )
 
     @app.middleware("http")
     async def logging_middleware(request: Request, call_next):
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         response = await call_next(request)
 
-        process_time = time.time() - start_time
-        logger.info(
-            f"{request.method} {request.url.path} - "
-            f"Status: {response.status_code} - "
-            f"Duration: {process_time:.4f}s"
-        )
+        process_time = time.perf_counter() - start_time
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s %s - Status: %s - Duration: %.4fs",
+                request.method, request.url.path, response.status_code, process_time,
+                extra={"status_code": response.status_code, "duration": process_time},
+            )
 
         return response
 
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware, registry=metrics)
+
     app.include_router(tasks_router)
 
     @app.get("/", tags=["health"])
     async def health_check():
-        return {"status": "ok", "version": settings.APP_VERSION}
+        health = {"status": "ok", "version": settings.APP_VERSION, "logging": logging_stats()}
+        if task_cache is not None:
+            health["task_cache"] = task_cache.stats()
+        if read_coalescer is not None:
+            health["read_coalescing"] = read_coalescer.stats()
+        return health
+
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        async def get_metrics():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
     return app
 
@@ -50,5 +126,5 @@ def create_app() -> FastAPI:
 app = create_app()
 
 if __name__ == "__main__":
-    logger.info(f"Starting {settings.APP_TITLE} v{settings.APP_VERSION}")
+    logger.info("Starting %s v%s", settings.APP_TITLE, settings.APP_VERSION)
     uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
\ No newline at end of file
@@ -0,0 +1,27 @@
+import uvicorn
+
+from src.app.core.config import settings
+
+
+# Production entry point: the parent process only binds the socket and supervises
+# the workers, each worker imports the app and runs its own event loop and pools
+def main() -> None:
+    uvicorn.run(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+        limit_max_requests=settings.SERVER_LIMIT_MAX_REQUESTS,
+        # Requests are already logged by the app's middleware
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
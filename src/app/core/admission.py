@@ -0,0 +1,156 @@
+import asyncio
+import collections
+import typing
+
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+
+from src.app.core.config import settings
+from src.app.core.metrics import format_metric, metrics
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+# Admits up to `limit` concurrent requests and queues up to `queue_size` more in
+# FIFO order. A queued request gives up after `timeout` seconds
+class Limiter:
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: typing.Deque[asyncio.Future] = collections.deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, wait: bool = True) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if not wait or len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            return False
+        return True
+
+    def release(self) -> None:
+        # A freed slot goes straight to the oldest waiter, so new arrivals can't overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    def __init__(
+            self,
+            app,
+            read: Limiter,
+            write: Limiter,
+            routes: typing.Optional[typing.Dict[str, Limiter]] = None,
+            saturated: typing.Callable[[bool, int], bool] = lambda write, waiting: False,
+            exempt: typing.Collection[str] = (),
+            retry_after: int = 1,
+    ):
+        self.app = app
+        self.read = read
+        self.write = write
+        # Path templates are matched here because the router only runs after admission
+        self.routes = [(compile_path(path)[0], limiter) for path, limiter in (routes or {}).items()]
+        self.saturated = saturated
+        self.exempt = exempt
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        write = scope["method"] not in READ_METHODS
+        limiters = [self.write if write else self.read]
+        route = self._route_limiter(scope)
+        if route is not None:
+            limiters.insert(0, route)
+
+        # A queued request waits for a slot, and a slot frees up together with its connection.
+        # Only when more requests already wait than the exhausted pool can serve is a new one
+        # shed right away instead of timing out in the queue
+        wait = not self.saturated(write, sum(limiter.waiting for limiter in limiters))
+        acquired = []
+        for limiter in limiters:
+            if not await limiter.acquire(wait):
+                for held in acquired:
+                    held.release()
+                await self._reject(scope, receive, send)
+                return
+            acquired.append(limiter)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in acquired:
+                limiter.release()
+
+    def _route_limiter(self, scope) -> typing.Optional[Limiter]:
+        for path_regex, limiter in self.routes:
+            if path_regex.match(scope["path"]):
+                return limiter
+        return None
+
+    async def _reject(self, scope, receive, send) -> None:
+        response = JSONResponse(
+            {"detail": "Server is overloaded, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
+
+
+def _limiter(limit: int) -> Limiter:
+    return Limiter(limit, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT)
+
+
+def _admission_metrics() -> typing.List[str]:
+    limiters = {
+        'budget="read"': read_limiter,
+        'budget="write"': write_limiter,
+        **{f'route="{path}"': limiter for path, limiter in route_limiters.items()},
+    }
+    return [
+        *format_metric("admission_active_requests", "gauge", "Requests admitted and being served.",
+                       {labels: limiter.active for labels, limiter in limiters.items()}),
+        *format_metric("admission_queued_requests", "gauge", "Requests waiting for admission.",
+                       {labels: limiter.waiting for labels, limiter in limiters.items()}),
+        *format_metric("admission_rejected_total", "counter", "Requests shed with 503 without waiting.",
+                       {labels: limiter.rejected for labels, limiter in limiters.items()}),
+        *format_metric("admission_timed_out_total", "counter", "Requests shed with 503 after waiting in the queue.",
+                       {labels: limiter.timed_out for labels, limiter in limiters.items()}),
+    ]
+
+
+read_limiter = _limiter(settings.ADMISSION_READ_CONCURRENCY)
+write_limiter = _limiter(settings.ADMISSION_WRITE_CONCURRENCY)
+route_limiters = {path: _limiter(limit) for path, limit in settings.ADMISSION_ROUTE_CONCURRENCY.items()}
+
+if settings.ADMISSION_CONTROL_ENABLED:
+    metrics.add_collector(_admission_metrics)
@@ -0,0 +1,99 @@
+import asyncio
+import typing
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.core.logging import get_logger
+
+logger = get_logger("db")
+
+T = typing.TypeVar('T')
+WriteOperation = typing.Callable[[AsyncSession], typing.Awaitable[T]]
+
+
+# Commits writes from concurrent requests together: operations arriving within
+# `window` seconds share one transaction, failed batches are retried one by one
+class WriteCoalescer:
+    def __init__(
+            self,
+            session_factory: typing.Callable[[], AsyncSession],
+            window: float,
+            max_batch_size: int,
+    ):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._queue: typing.Optional[asyncio.Queue] = None
+        self._worker: typing.Optional[asyncio.Task] = None
+
+    async def submit(self, operation: WriteOperation[T]) -> T:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None and not self._worker.done():
+            self._queue.put_nowait(None)
+            await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+
+            if self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.window)
+
+            closing = False
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if closing:
+                return
+
+    async def _flush(self, batch: typing.List[typing.Tuple[WriteOperation, asyncio.Future]]) -> None:
+        batch = [(operation, future) for operation, future in batch if not future.done()]
+        if len(batch) <= 1:
+            for operation, future in batch:
+                await self._run_single(operation, future)
+            return
+
+        try:
+            async with self.session_factory() as session:
+                results = [await operation(session) for operation, _ in batch]
+                await session.commit()
+        except Exception as e:
+            logger.warning("Write batch of %s operations failed (%s), retrying one by one", len(batch), e)
+            for operation, future in batch:
+                await self._run_single(operation, future)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_single(self, operation: WriteOperation, future: asyncio.Future) -> None:
+        try:
+            async with self.session_factory() as session:
+                result = await operation(session)
+                await session.commit()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if not future.done():
+            future.set_result(result)
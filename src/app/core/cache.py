@@ -0,0 +1,78 @@
+import time
+import typing
+from collections import OrderedDict
+
+K = typing.TypeVar('K')
+V = typing.TypeVar('V')
+
+
+class Cache(typing.Protocol[K, V]):
+    generation: int
+
+    def get(self, key: K) -> typing.Optional[V]:
+        ...
+
+    def set(self, key: K, value: V, generation: typing.Optional[int] = None) -> None:
+        ...
+
+    def invalidate(self, *keys: K) -> None:
+        ...
+
+    def stats(self) -> typing.Dict[str, int]:
+        ...
+
+
+class LRUCache(typing.Generic[K, V]):
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[K, typing.Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: K) -> typing.Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, generation: typing.Optional[int] = None) -> None:
+        # A value loaded before the latest invalidation may already be stale
+        if generation is not None and generation != self.generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *keys: K) -> None:
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
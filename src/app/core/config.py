@@ -1,6 +1,8 @@
+import os
 import typing
 
 import pytz
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 ROUTE_PREFIX_V1 = "/v1"
@@ -9,8 +11,62 @@ class Settings(BaseSettings):
     APP_TITLE: str = "Task Manager API"
     APP_DESCRIPTION: str = "REST API service for managing tasks"
     APP_VERSION: str = "0.1.0"
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8080
+    SERVER_WORKERS: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_GRACEFUL_SHUTDOWN_TIMEOUT: int = 30
+    SERVER_LIMIT_MAX_REQUESTS: typing.Optional[int] = None
     DATABASE_URL: str = "sqlite+aiosqlite:///./test.db"
+    DATABASE_SHARDS: int = Field(1, ge=1, le=8192)
+    DATABASE_ECHO: bool = False
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    DATABASE_READ_POOL_SIZE: int = 0
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT: int = 5000
     TIMEZONE: typing.ClassVar = pytz.timezone("Europe/Moscow")
+    TASKS_PAGE_SIZE: int = 100
+    TASKS_MAX_PAGE_SIZE: int = 1000
+    TASKS_SEARCH_MAX_OFFSET: int = 10000
+    TASKS_EXPORT_BATCH_SIZE: int = 1000
+    TASKS_BULK_MAX_ITEMS: int = 10000
+    TASKS_BULK_CHUNK_SIZE: int = 500
+    TASKS_IMPORT_BATCH_SIZE: int = 1000
+    TASKS_IMPORT_CHUNK_SIZE: int = 50000
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_ZSTD_LEVEL: int = 3
+    TASK_TOMBSTONE_RETENTION_DAYS: int = 30
+    TASK_CACHE_SIZE: int = 10000
+    TASK_CACHE_TTL: float = 30.0
+    READ_COALESCING_ENABLED: bool = True
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_FEED_BUFFER_SIZE: int = 256
+    CHANGE_FEED_HISTORY_SIZE: int = 10000
+    CHANGE_FEED_MAX_SUBSCRIBERS: int = 1000
+    CHANGE_FEED_HEARTBEAT: float = 15.0
+    WRITE_COALESCING_ENABLED: bool = False
+    WRITE_BATCH_WINDOW: float = 0.002
+    WRITE_BATCH_MAX_SIZE: int = 64
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_READ_CONCURRENCY: int = 64
+    ADMISSION_WRITE_CONCURRENCY: int = 16
+    ADMISSION_ROUTE_CONCURRENCY: typing.Dict[str, int] = {"/tasks/export": 4, "/tasks/bulk": 4}
+    ADMISSION_QUEUE_SIZE: int = 128
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    ADMISSION_RETRY_AFTER: int = 1
+    METRICS_ENABLED: bool = True
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLING: typing.Dict[str, float] = {}
+    LOG_RATE_LIMITS: typing.Dict[str, float] = {}
 
     class Config:
         env_file = ".env"
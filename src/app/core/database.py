@@ -1,19 +1,191 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import os
+import typing
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import QueuePool
 from .config import settings
+from .metrics import InstrumentedQueuePool, metrics
+
+
+def _is_memory_database(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(read_only: bool) -> typing.List[str]:
+    pragmas = [
+        f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def create_engine_from_settings(database_url: str, read_only: bool = False, name: str = "writer") -> AsyncEngine:
+    url = make_url(database_url)
+    options: typing.Dict[str, typing.Any] = {"echo": settings.DATABASE_ECHO}
+    if not _is_memory_database(url):
+        if read_only:
+            options.update(pool_size=settings.DATABASE_READ_POOL_SIZE, max_overflow=0)
+        elif settings.DATABASE_READ_POOL_SIZE > 0:
+            # SQLite allows a single writer, extra writer connections would only wait on its lock
+            options.update(pool_size=1, max_overflow=0)
+        else:
+            options.update(pool_size=settings.DATABASE_POOL_SIZE, max_overflow=settings.DATABASE_MAX_OVERFLOW)
+        options["pool_timeout"] = settings.DATABASE_POOL_TIMEOUT
+        if settings.METRICS_ENABLED:
+            options.update(poolclass=InstrumentedQueuePool, pool_logging_name=name)
+
+    async_engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == "sqlite":
+        pragmas = _sqlite_pragmas(read_only)
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    if settings.METRICS_ENABLED:
+        metrics.instrument_engine(name, async_engine)
+
+    return async_engine
+
+
+async def warm_up_engine(async_engine: AsyncEngine) -> int:
+    # Opens the whole pool up front, so connecting and the PRAGMAs don't land on the first requests
+    pool = async_engine.sync_engine.pool
+    size = pool.size() if isinstance(pool, QueuePool) else 1
+    connections = await asyncio.gather(*(async_engine.connect() for _ in range(size)))
+    try:
+        for connection in connections:
+            await connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in connections:
+            await connection.close()
+    return size
+
+
+# Plain SELECTs go to the read pool, everything else to the writer. Once a
+# transaction has written, its reads stay on the writer to see its own changes
+class RoutingSession(Session):
+    writer: typing.ClassVar[AsyncEngine]
+    reader: typing.ClassVar[AsyncEngine]
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("writer") or self._flushing or not getattr(clause, "is_select", False):
+            self.info["writer"] = True
+            return self.writer.sync_engine
+        return self.reader.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writer", None)
+
+
+def routing_session(writer: AsyncEngine, reader: AsyncEngine) -> typing.Type[RoutingSession]:
+    return type("RoutingSession", (RoutingSession,), {"writer": writer, "reader": reader})
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+
+def shard_url(database_url: str, shard: int) -> str:
+    # Shard 0 is the DATABASE_URL file itself, so a single database becomes the first shard as is
+    url = make_url(database_url)
+    if shard == 0 or _is_memory_database(url):
+        return database_url
+    root, extension = os.path.splitext(url.database)
+    return url.set(database=f"{root}-shard{shard}{extension}").render_as_string(hide_password=False)
+
+
+class Shard(typing.NamedTuple):
+    writer: AsyncEngine
+    reader: typing.Optional[AsyncEngine]
+    sessions: sessionmaker
+
+
+def _engine_prefix(shard: int) -> str:
+    # Shard 0 keeps the engine names of a single database
+    return f"shard{shard}_" if shard else ""
+
+
+def create_shard(database_url: str, prefix: str = "") -> Shard:
+    writer = create_engine_from_settings(database_url, name=f"{prefix}writer")
+    if settings.DATABASE_READ_POOL_SIZE <= 0 or _is_memory_database(make_url(database_url)):
+        return Shard(writer, None, sessionmaker(bind=writer, class_=AsyncSession, expire_on_commit=False))
+
+    reader = create_engine_from_settings(database_url, read_only=True, name=f"{prefix}reader")
+    sessions = sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=routing_session(writer, reader),
+        expire_on_commit=False,
+    )
+    return Shard(writer, reader, sessions)
+
+
+shards = [
+    create_shard(shard_url(settings.DATABASE_URL, shard), _engine_prefix(shard))
+    for shard in range(settings.DATABASE_SHARDS)
+]
+engine, read_engine, AsyncSessionLocal = shards[0]
 
 Base = declarative_base()
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
\ No newline at end of file
+
+def engines() -> typing.Dict[str, AsyncEngine]:
+    named = {}
+    for shard, (writer, reader, _) in enumerate(shards):
+        prefix = _engine_prefix(shard)
+        named[f"{prefix}writer"] = writer
+        if reader is not None:
+            named[f"{prefix}reader"] = reader
+    return named
+
+
+async def warm_up_engines() -> typing.Dict[str, int]:
+    named = engines()
+    sizes = await asyncio.gather(*(warm_up_engine(async_engine) for async_engine in named.values()))
+    return dict(zip(named, sizes))
+
+
+def _pool_saturated(async_engine: AsyncEngine, waiting: int) -> bool:
+    # Every connection the pool may open is checked out, and the requests already queued
+    # would take each one it frees up: a new request could only wait for the pool timeout
+    pool = async_engine.sync_engine.pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return False
+    capacity = pool.size() + pool._max_overflow
+    return pool.checkedout() >= capacity and waiting >= capacity
+
+
+def pool_saturated(write: bool, waiting: int) -> bool:
+    # Lists and searches need every shard, so any saturated shard holds them up
+    return any(
+        _pool_saturated(writer if write or reader is None else reader, waiting)
+        for writer, reader, _ in shards
+    )
+
+
+async def dispose_engines() -> None:
+    for async_engine in engines().values():
+        await async_engine.dispose()
+
+
+async def get_shard_dbs():
+    sessions = [shard.sessions() for shard in shards]
+    try:
+        yield sessions
+    finally:
+        # Sessions of shards the request didn't touch hold no connection
+        for session in sessions:
+            if session.in_transaction():
+                await session.close()
@@ -0,0 +1,278 @@
+import csv
+import io
+import typing
+import zlib
+from datetime import datetime
+
+import msgpack
+import zstandard
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from src.app.core import http_cache
+from src.app.core.config import settings
+from src.app.core.logging import get_logger
+from src.app.core.mapper import DTOMapper, TASK_FIELDS
+
+logger = get_logger("api")
+
+Row = typing.Dict[str, typing.Any]
+Fields = typing.Optional[typing.Tuple[str, ...]]
+
+# Preferred first when the client accepts several codings with the same weight
+CONTENT_CODINGS = ("zstd", "gzip")
+
+
+def _project(rows: typing.Iterable[Row], fields: Fields) -> typing.List[Row]:
+    # Rows may carry columns that were only selected for cursors and validators
+    names = fields or TASK_FIELDS
+    return [{name: row[name] for name in names} for row in rows]
+
+
+def _plain(value: typing.Any) -> typing.Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# A document is written as begin + rows(batch)... + end, so the same encoder
+# serves whole pages and streams of batches of any length
+class Encoder:
+    media_type: str = ""
+
+    def begin(self, fields: Fields) -> bytes:
+        return b""
+
+    def rows(self, rows: typing.List[Row], fields: Fields, first: bool) -> bytes:
+        raise NotImplementedError
+
+    def end(self) -> bytes:
+        return b""
+
+    def document(self, rows: typing.List[Row], fields: Fields = None) -> bytes:
+        return self.begin(fields) + self.rows(rows, fields, True) + self.end()
+
+    def item(self, row: Row, fields: Fields = None) -> bytes:
+        return self.document([row], fields)
+
+    async def stream(
+            self,
+            batches: typing.AsyncIterator[typing.List[Row]],
+            fields: Fields = None,
+    ) -> typing.AsyncIterator[bytes]:
+        head = self.begin(fields)
+        first = True
+        async for rows in batches:
+            chunk = self.rows(rows, fields, first)
+            first = first and not chunk
+            yield head + chunk
+            head = b""
+        yield head + self.end()
+
+
+class JsonEncoder(Encoder):
+    media_type = "application/json"
+
+    def begin(self, fields: Fields) -> bytes:
+        return b"["
+
+    def rows(self, rows: typing.List[Row], fields: Fields, first: bool) -> bytes:
+        if not rows:
+            return b""
+        body = DTOMapper.rows_to_json(rows, fields)[1:-1]
+        return body if first else b"," + body
+
+    def end(self) -> bytes:
+        return b"]"
+
+    def document(self, rows: typing.List[Row], fields: Fields = None) -> bytes:
+        return DTOMapper.rows_to_json(rows, fields)
+
+    def item(self, row: Row, fields: Fields = None) -> bytes:
+        return DTOMapper.row_to_json(row, fields)
+
+
+class NdjsonEncoder(Encoder):
+    media_type = "application/x-ndjson"
+
+    def rows(self, rows: typing.List[Row], fields: Fields, first: bool) -> bytes:
+        return b"".join(DTOMapper.row_to_json(row, fields) + b"\n" for row in rows)
+
+
+class MsgpackEncoder(Encoder):
+    media_type = "application/msgpack"
+
+    def __init__(self):
+        self.packer = msgpack.Packer(default=_plain)
+
+    # Streams are a sequence of maps (read them with msgpack.Unpacker), whole documents are one array
+    def rows(self, rows: typing.List[Row], fields: Fields, first: bool) -> bytes:
+        return b"".join(self.packer.pack(row) for row in _project(rows, fields))
+
+    def document(self, rows: typing.List[Row], fields: Fields = None) -> bytes:
+        return self.packer.pack(_project(rows, fields))
+
+    def item(self, row: Row, fields: Fields = None) -> bytes:
+        return self.packer.pack(_project([row], fields)[0])
+
+
+class CsvEncoder(Encoder):
+    media_type = "text/csv"
+
+    def begin(self, fields: Fields) -> bytes:
+        return self._write([fields or TASK_FIELDS])
+
+    def rows(self, rows: typing.List[Row], fields: Fields, first: bool) -> bytes:
+        names = fields or TASK_FIELDS
+        return self._write([_plain(row[name]) for name in names] for row in rows)
+
+    @staticmethod
+    def _write(lines: typing.Iterable[typing.Iterable[typing.Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(lines)
+        return buffer.getvalue().encode()
+
+
+def _parse_weighted(header: str) -> typing.Dict[str, float]:
+    weights = {}
+    for part in header.split(","):
+        name, *params = part.strip().split(";")
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    return weights
+
+
+def _match(ranges: typing.Dict[str, float], media_type: str) -> typing.Optional[typing.Tuple[float, int]]:
+    # The most specific matching range decides the weight (RFC 9110, 12.5.1)
+    main_type = media_type.split("/")[0]
+    for specificity, candidate in ((2, media_type), (1, f"{main_type}/*"), (0, "*/*")):
+        if candidate in ranges:
+            return ranges[candidate], specificity
+    return None
+
+
+class EncoderRegistry:
+    def __init__(self):
+        self.encoders: typing.Dict[str, Encoder] = {}
+
+    def register(self, encoder: Encoder, *aliases: str) -> None:
+        for media_type in (encoder.media_type, *aliases):
+            self.encoders[media_type] = encoder
+
+    def negotiate(self, request: Request, default: str = "application/json") -> Encoder:
+        accept = request.headers.get("accept")
+        if not accept:
+            return self.encoders[default]
+
+        ranges = _parse_weighted(accept)
+        best, best_key = None, None
+        for media_type, encoder in self.encoders.items():
+            match = _match(ranges, media_type)
+            if match is None or match[0] <= 0:
+                continue
+            key = (*match, media_type == default)
+            if best_key is None or key > best_key:
+                best, best_key = encoder, key
+
+        if best is None:
+            raise HTTPException(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                detail=f"Supported media types: {', '.join(self.encoders)}"
+            )
+        return best
+
+
+def negotiate_coding(request: Request) -> typing.Optional[str]:
+    accept_encoding = request.headers.get("accept-encoding")
+    if not accept_encoding:
+        return None
+
+    ranges = _parse_weighted(accept_encoding)
+    best, best_weight = None, 0.0
+    for coding in CONTENT_CODINGS:
+        weight = ranges.get(coding, ranges.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class _Compressor:
+    def __init__(self, coding: str):
+        if coding == "gzip":
+            self._compressor = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._block = zlib.Z_SYNC_FLUSH
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compressobj()
+            self._block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def block(self, data: bytes) -> bytes:
+        # Flushed per chunk so a streaming client can decode what it has already received
+        return self._compressor.compress(data) + self._compressor.flush(self._block)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+def _headers(coding: typing.Optional[str]) -> typing.Dict[str, str]:
+    headers = {"Vary": http_cache.VARY}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return headers
+
+
+def render_response(request: Request, encoder: Encoder, body: bytes) -> Response:
+    coding = negotiate_coding(request) if len(body) >= settings.RESPONSE_COMPRESSION_MIN_SIZE else None
+    if coding is not None:
+        body = _Compressor(coding).finish(body)
+    return Response(body, media_type=encoder.media_type, headers=_headers(coding))
+
+
+async def _compress(chunks: typing.AsyncIterator[bytes], coding: str) -> typing.AsyncIterator[bytes]:
+    compressor = _Compressor(coding)
+    async for chunk in chunks:
+        data = compressor.block(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _resume(first: bytes, chunks: typing.AsyncIterator[bytes]) -> typing.AsyncIterator[bytes]:
+    yield first
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception:
+        # The status line is already sent: the server aborts the response instead of finishing it
+        logger.exception("Streaming response failed")
+        raise
+
+
+async def stream_response(
+        request: Request,
+        encoder: Encoder,
+        batches: typing.AsyncIterator[typing.List[Row]],
+        fields: Fields = None,
+) -> StreamingResponse:
+    coding = negotiate_coding(request)
+    chunks = encoder.stream(batches, fields)
+    if coding is not None:
+        chunks = _compress(chunks, coding)
+
+    # The first batch is fetched and encoded before the response starts, so a
+    # failing query or encoder still gets a proper error status
+    first = await chunks.__anext__()
+    return StreamingResponse(_resume(first, chunks), media_type=encoder.media_type, headers=_headers(coding))
+
+
+encoders = EncoderRegistry()
+encoders.register(JsonEncoder())
+encoders.register(NdjsonEncoder())
+encoders.register(MsgpackEncoder(), "application/x-msgpack")
+encoders.register(CsvEncoder())
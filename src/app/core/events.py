@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import secrets
+import typing
+
+
+class Event(typing.NamedTuple):
+    sequence: int
+    type: str
+    # Encoded once at publish time and shared by every subscriber
+    frame: bytes
+
+
+class Subscription:
+    def __init__(self, replay: typing.Iterable[Event], buffer_size: int, reset: bool = False):
+        self.buffer_size = buffer_size
+        # The client's position is gone from the history: it has to reload everything
+        self.reset = reset
+        self.closed = False
+        self.overflowed = False
+        self._replay = collections.deque(replay)
+        self._buffer: typing.Deque[Event] = collections.deque()
+        self._wakeup = asyncio.Event()
+
+    def offer(self, event: Event) -> bool:
+        if len(self._buffer) >= self.buffer_size:
+            return False
+        self._buffer.append(event)
+        self._wakeup.set()
+        return True
+
+    def close(self, overflowed: bool = False) -> None:
+        self.closed = True
+        self.overflowed = overflowed
+        self._wakeup.set()
+
+    async def next(self, timeout: float) -> typing.Optional[Event]:
+        # None means nothing happened within the timeout, StopAsyncIteration that the subscription ended
+        if self._replay:
+            return self._replay.popleft()
+        if not self._buffer and not self.closed:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self._buffer:
+            return self._buffer.popleft()
+        raise StopAsyncIteration
+
+
+# In-process pub/sub: publish() never blocks on subscribers, a subscriber whose
+# buffer is full is disconnected and resumes from the history when it reconnects
+class EventBroker:
+    def __init__(self, buffer_size: int, history_size: int, max_subscribers: int):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        # Sequence numbers restart with the process, the epoch tells positions from an older process apart
+        self.epoch = secrets.token_hex(4)
+        self.sequence = 0
+        self.published = 0
+        self.disconnected = 0
+        self._history: typing.Deque[Event] = collections.deque(maxlen=history_size)
+        self._subscribers: typing.Set[Subscription] = set()
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def position(self, sequence: typing.Optional[int] = None) -> str:
+        return f"{self.epoch}-{self.sequence if sequence is None else sequence}"
+
+    def publish(self, event_type: str, data: bytes) -> Event:
+        self.sequence += 1
+        self.published += 1
+        frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (self.position().encode(), event_type.encode(), data)
+        event = Event(self.sequence, event_type, frame)
+        self._history.append(event)
+
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                self._subscribers.discard(subscription)
+                subscription.close(overflowed=True)
+                self.disconnected += 1
+        return event
+
+    @staticmethod
+    def parse_position(position: str) -> typing.Tuple[str, int]:
+        # Raises ValueError for anything position() can't have produced
+        epoch, _, sequence = position.rpartition("-")
+        return epoch, int(sequence)
+
+    def subscribe(self, since: typing.Optional[str] = None) -> Subscription:
+        # Replay and registration happen without awaiting, so no event is missed or repeated in between
+        replay, reset = [], False
+        if since is not None:
+            epoch, sequence = self.parse_position(since)
+            oldest = self._history[0].sequence if self._history else self.sequence + 1
+            if epoch != self.epoch or sequence > self.sequence or sequence < oldest - 1:
+                reset = True
+            else:
+                replay = [event for event in self._history if event.sequence > sequence]
+
+        subscription = Subscription(replay, self.buffer_size, reset)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def close(self) -> None:
+        for subscription in self._subscribers:
+            subscription.close()
+        self._subscribers.clear()
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "position": self.position(),
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "disconnected": self.disconnected,
+        }
+
+
+async def sse_stream(
+        broker: EventBroker,
+        since: typing.Optional[str],
+        heartbeat: float,
+) -> typing.AsyncIterator[bytes]:
+    # Subscribes once the response body starts: a client gone before that never registers
+    subscription = broker.subscribe(since)
+    try:
+        if subscription.reset:
+            yield b"id: %s\nevent: reset\ndata: {}\n\n" % broker.position().encode()
+        while True:
+            try:
+                event = await subscription.next(heartbeat)
+            except StopAsyncIteration:
+                break
+            # Comment lines keep proxies from timing out idle connections
+            yield b": ping\n\n" if event is None else event.frame
+        if subscription.overflowed:
+            # EventSource reconnects with Last-Event-ID and catches up from the history
+            yield b"event: overflow\ndata: {}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
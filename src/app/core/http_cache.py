@@ -0,0 +1,68 @@
+import hashlib
+import typing
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+from src.app.core.config import settings
+
+# Request headers a task representation depends on, sent with the full response and with its 304
+VARY = "Accept, Accept-Encoding"
+
+
+def make_etag(*parts: typing.Any) -> str:
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def to_utc(value: datetime) -> datetime:
+    # Timestamps are stored without an offset in settings.TIMEZONE
+    if value.tzinfo is None:
+        value = settings.TIMEZONE.localize(value)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(to_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def has_preconditions(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: typing.Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence and uses the weak comparison (RFC 9110, 13.1.2)
+        if if_none_match.strip() == "*":
+            return True
+        tags = (tag.strip() for tag in if_none_match.split(","))
+        return etag in {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+
+    return to_utc(last_modified).replace(microsecond=0) <= since
+
+
+def set_validators(response: Response, etag: str, last_modified: typing.Optional[datetime] = None) -> None:
+    # A compressed body isn't byte-identical to the uncompressed one, so its validator is weak
+    if "content-encoding" in response.headers and not etag.startswith("W/"):
+        etag = f"W/{etag}"
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: typing.Optional[datetime] = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"Vary": VARY})
+    set_validators(response, etag, last_modified)
+    return response
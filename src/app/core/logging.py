@@ -1,40 +1,171 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
 import typing
 
 from fastapi.logger import logger as fastapi_logger
 from pydantic import BaseModel
 
+from src.app.core.config import settings
+from src.app.core.metrics import format_metric, metrics
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
 
 class LogConfig(BaseModel):
     LOGGER_NAME: str = "task_manager"
     LOG_FORMAT: str = "%(asctime)s | %(levelname)s | %(message)s"
-    LOG_LEVEL: str = "INFO"
-
-    version: int = 1
-    disable_existing_loggers: bool = False
-    formatters: typing.Dict[str, typing.Dict[str, str]] = {
-        "default": {
-            "format": LOG_FORMAT,
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-    }
-    handlers: typing.Dict[str, typing.Dict[str, typing.Any]] = {
-        "default": {
-            "formatter": "default",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
-        },
-    }
-    loggers: typing.Dict[str, typing.Dict[str, typing.Any]] = {
-        LOGGER_NAME: {
-            "handlers": ["default"],
-            "level": LOG_LEVEL,
-            "propagate": False,
-        },
+    LOG_DATE_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+    LOG_LEVEL: str = settings.LOG_LEVEL
+    LOG_JSON: bool = settings.LOG_JSON
+    LOG_QUEUE_SIZE: int = settings.LOG_QUEUE_SIZE
+    LOG_SAMPLING: typing.Dict[str, float] = settings.LOG_SAMPLING
+    LOG_RATE_LIMITS: typing.Dict[str, float] = settings.LOG_RATE_LIMITS
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # Never waits for the listener: a full queue drops the record and counts it
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+        self.emit_seconds = 0.0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        start = time.perf_counter()
+        super().emit(record)
+        self.emit_seconds += time.perf_counter() - start
+
+
+class LoggerFilter(logging.Filter):
+    # Installed on the shared handler, where it also sees records of child loggers:
+    # applies to the named logger and its children, lets everything else through
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not super().filter(record) or self.keep(record)
+
+    def keep(self, record: logging.LogRecord) -> bool:
+        raise NotImplementedError
+
+
+class SamplingFilter(LoggerFilter):
+    def __init__(self, rate: float, name: str = ""):
+        super().__init__(name)
+        self.rate = rate
+
+    def keep(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.ERROR or random.random() < self.rate
+
+
+class RateLimitFilter(LoggerFilter):
+    def __init__(self, per_second: float, name: str = ""):
+        super().__init__(name)
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated_at = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def keep(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated_at) * self.per_second)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.suppressed += 1
+            return False
+
+
+def _create_handler(config: LogConfig) -> typing.Tuple[NonBlockingQueueHandler, logging.handlers.QueueListener]:
+    if config.LOG_JSON:
+        formatter = JsonFormatter(datefmt=config.LOG_DATE_FORMAT)
+    else:
+        formatter = logging.Formatter(config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    return NonBlockingQueueHandler(log_queue), listener
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{LogConfig().LOGGER_NAME}.{name}")
+
+
+def logging_stats() -> typing.Dict[str, typing.Any]:
+    return {
+        "enqueued": queue_handler.enqueued,
+        "dropped": queue_handler.dropped,
+        "emit_seconds": round(queue_handler.emit_seconds, 6),
+        "queue_size": queue_handler.queue.qsize(),
     }
 
-import logging.config
-logging.config.dictConfig(LogConfig().model_dump())
-logger = logging.getLogger(LogConfig().LOGGER_NAME)
+
+def _logging_metrics() -> typing.List[str]:
+    return [
+        *format_metric("log_records_enqueued_total", "counter", "Log records handed to the listener thread.",
+                       {"": queue_handler.enqueued}),
+        *format_metric("log_records_dropped_total", "counter", "Log records dropped because the queue was full.",
+                       {"": queue_handler.dropped}),
+        *format_metric("log_emit_seconds_total", "counter", "Time request handlers spent enqueueing log records.",
+                       {"": queue_handler.emit_seconds}),
+    ]
+
+
+log_config = LogConfig()
+queue_handler, log_listener = _create_handler(log_config)
+
+logger = logging.getLogger(log_config.LOGGER_NAME)
+logger.handlers = [queue_handler]
+logger.setLevel(log_config.LOG_LEVEL)
+logger.propagate = False
+
+for logger_name, rate in log_config.LOG_SAMPLING.items():
+    queue_handler.addFilter(SamplingFilter(rate, logger_name))
+for logger_name, per_second in log_config.LOG_RATE_LIMITS.items():
+    queue_handler.addFilter(RateLimitFilter(per_second, logger_name))
+
+metrics.add_collector(_logging_metrics)
+
+log_listener.start()
+atexit.register(log_listener.stop)
 
 fastapi_logger.handlers = logger.handlers
-fastapi_logger.setLevel(logger.level)
\ No newline at end of file
+fastapi_logger.setLevel(logger.level)
@@ -1,12 +1,33 @@
+import functools
 import typing
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
 
 from src.app.task.models import Task
-from src.app.task.schemas import TaskResponse, TaskCreate, TaskUpdate
+from src.app.task.schemas import TaskResponse, TaskCreate, TaskUpdate, TaskBulkUpdateItem, TaskSearchResult
 
 T = typing.TypeVar('T', bound=BaseModel)
 
+TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+
+@functools.lru_cache(maxsize=None)
+def _task_fields_schema(fields: typing.Tuple[str, ...]) -> type:
+    # Serializes only the given keys of a row dict, anything else in the row is skipped
+    return TypedDict("TaskFields", {name: TaskResponse.model_fields[name].annotation for name in fields})
+
+
+@functools.lru_cache(maxsize=None)
+def _task_row_adapter(fields: typing.Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(_task_fields_schema(fields))
+
+
+@functools.lru_cache(maxsize=None)
+def _task_rows_adapter(fields: typing.Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(typing.List[_task_fields_schema(fields)])
+
+
 class DTOMapper:
 
     @staticmethod
@@ -30,10 +51,32 @@ class DTOMapper:
     def tasks_to_responses(tasks: typing.List[Task]) -> typing.List[TaskResponse]:
         return [DTOMapper.task_to_response(task) for task in tasks]
 
+    @staticmethod
+    def rows_to_json(
+            rows: typing.List[typing.Dict[str, typing.Any]],
+            fields: typing.Optional[typing.Tuple[str, ...]] = None,
+    ) -> bytes:
+        # Rows were read from typed columns, so they are encoded without another validation pass
+        return _task_rows_adapter(fields or TASK_FIELDS).dump_json(rows)
+
+    @staticmethod
+    def row_to_json(row: typing.Dict[str, typing.Any], fields: typing.Optional[typing.Tuple[str, ...]] = None) -> bytes:
+        return _task_row_adapter(fields or TASK_FIELDS).dump_json(row)
+
+    @staticmethod
+    def search_hit_to_result(task: Task, snippet: typing.Optional[str]) -> TaskSearchResult:
+        result = TaskSearchResult.model_validate(task)
+        result.snippet = snippet
+        return result
+
     @staticmethod
     def create_dto_to_dict(task_dto: TaskCreate) -> typing.Dict[str, typing.Any]:
         return task_dto.model_dump()
 
     @staticmethod
     def update_dto_to_dict(task_dto: TaskUpdate) -> typing.Dict[str, typing.Any]:
-        return task_dto.model_dump(exclude_unset=True)
\ No newline at end of file
+        return task_dto.model_dump(exclude_unset=True)
+
+    @staticmethod
+    def bulk_update_dto_to_dict(task_dto: TaskBulkUpdateItem) -> typing.Dict[str, typing.Any]:
+        return task_dto.model_dump(exclude_unset=True, exclude={"id"})
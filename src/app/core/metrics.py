@@ -0,0 +1,192 @@
+import bisect
+import time
+import typing
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Collector = typing.Callable[[], typing.Iterable[str]]
+
+
+def format_metric(name: str, kind: str, help_text: str, samples: typing.Dict[str, float]) -> typing.List[str]:
+    # samples maps a label string (possibly empty) to the value
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples.items():
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return lines
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> typing.Iterator[str]:
+        separator = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{separator}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+# Everything runs on the event loop thread, so plain counters need no locks.
+# Histograms are allocated once per label set and reused afterwards.
+class MetricsRegistry:
+    def __init__(self):
+        self.requests: typing.Dict[str, typing.Dict[str, typing.Dict[int, Histogram]]] = {}
+        self.requests_in_flight = 0
+        self.statements: typing.Dict[str, Histogram] = {}
+        self.pool_waits: typing.Dict[str, Histogram] = {}
+        self.engines: typing.Dict[str, AsyncEngine] = {}
+        self.collectors: typing.List[Collector] = []
+        self._statement_kinds: typing.Dict[str, str] = {}
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float) -> None:
+        by_method = self.requests.get(route)
+        if by_method is None:
+            by_method = self.requests[route] = {}
+        by_status = by_method.get(method)
+        if by_status is None:
+            by_status = by_method[method] = {}
+        histogram = by_status.get(status_code)
+        if histogram is None:
+            histogram = by_status[status_code] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_statement(self, statement: str, seconds: float) -> None:
+        kind = self._statement_kinds.get(statement)
+        if kind is None:
+            kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            # Compiled statements are reused, but IN lists and literals can make them unbounded
+            if len(self._statement_kinds) < 10000:
+                self._statement_kinds[statement] = kind
+        histogram = self.statements.get(kind)
+        if histogram is None:
+            histogram = self.statements[kind] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_pool_wait(self, pool: str, seconds: float) -> None:
+        histogram = self.pool_waits.get(pool)
+        if histogram is None:
+            histogram = self.pool_waits[pool] = Histogram()
+        histogram.observe(seconds)
+
+    def instrument_engine(self, name: str, engine: AsyncEngine) -> None:
+        self.engines[name] = engine
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_started_at = time.perf_counter()
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.observe_statement(statement, time.perf_counter() - context._metrics_started_at)
+
+    def add_collector(self, collector: Collector) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds HTTP request latency by route, method and status.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for route, by_method in self.requests.items():
+            for method, by_status in by_method.items():
+                for status_code, histogram in by_status.items():
+                    labels = f'route="{route}",method="{method}",status="{status_code}"'
+                    lines.extend(histogram.render("http_request_duration_seconds", labels))
+
+        lines += [
+            "# HELP http_requests_in_flight HTTP requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.requests_in_flight}",
+            "# HELP db_statement_duration_seconds SQL statement execution time by statement type.",
+            "# TYPE db_statement_duration_seconds histogram",
+        ]
+        for kind, histogram in self.statements.items():
+            lines.extend(histogram.render("db_statement_duration_seconds", f'statement="{kind}"'))
+
+        lines += [
+            "# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection.",
+            "# TYPE db_pool_checkout_wait_seconds histogram",
+        ]
+        for pool, histogram in self.pool_waits.items():
+            lines.extend(histogram.render("db_pool_checkout_wait_seconds", f'pool="{pool}"'))
+
+        lines += [
+            "# HELP db_pool_connections Pooled connections by state.",
+            "# TYPE db_pool_connections gauge",
+        ]
+        for name, engine in self.engines.items():
+            pool = engine.sync_engine.pool
+            if isinstance(pool, AsyncAdaptedQueuePool):
+                lines.append(f'db_pool_connections{{pool="{name}",state="checked_out"}} {pool.checkedout()}')
+                lines.append(f'db_pool_connections{{pool="{name}",state="idle"}} {pool.checkedin()}')
+                lines.append(f'db_pool_connections{{pool="{name}",state="size"}} {pool.size()}')
+
+        for collector in self.collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_wait(self.logging_name or "default", time.perf_counter() - started_at)
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.requests_in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.requests_in_flight -= 1
+            # The router stores the matched route in the scope; raw paths would explode cardinality
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status_code,
+                time.perf_counter() - started_at,
+            )
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,14 @@
+import typing
+
+# Row ids carry their shard in the high bits. Shard 0 keeps the ids of a single
+# database, and 8192 shards still fit below 2**53, where JavaScript numbers stay exact
+SHARD_ID_BITS = 40
+
+
+def shard_of(row_id: int) -> int:
+    return row_id >> SHARD_ID_BITS
+
+
+def shard_id_range(shard: int) -> typing.Tuple[int, int]:
+    floor = shard << SHARD_ID_BITS
+    return floor, floor + (1 << SHARD_ID_BITS)
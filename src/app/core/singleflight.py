@@ -0,0 +1,58 @@
+import asyncio
+import typing
+
+T = typing.TypeVar('T')
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+# Concurrent calls with the same key share one execution: the first caller runs
+# it, everyone arriving while it runs awaits the same result or exception
+class SingleFlight:
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights: typing.Dict[typing.Hashable, asyncio.Future] = {}
+
+    async def do(self, key: typing.Hashable, fn: typing.Callable[[], typing.Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        while flight is not None:
+            self.shared += 1
+            try:
+                # Shielded, so a waiter that goes away doesn't cancel the result for the others
+                return await asyncio.shield(flight)
+            except _LeaderCancelled:
+                # The caller running the query went away, the next waiter takes over
+                self.shared -= 1
+                flight = self._flights.get(key)
+
+        self.calls += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except BaseException as e:
+            flight.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Marks the exception as retrieved, there may be nobody waiting for it
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def forget(self, predicate: typing.Callable[[typing.Hashable], bool]) -> None:
+        # Callers already waiting keep the result they joined, later ones start a fresh call
+        for key in [key for key in self._flights if predicate(key)]:
+            del self._flights[key]
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
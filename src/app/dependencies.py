@@ -1,16 +1,87 @@
+import typing
+
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.app.core.database import get_db
+from src.app.core.batching import WriteCoalescer
+from src.app.core.cache import LRUCache
+from src.app.core.config import settings
+from src.app.core.database import get_shard_dbs, shards
+from src.app.core.events import EventBroker
+from src.app.core.metrics import format_metric, metrics
+from src.app.core.singleflight import SingleFlight
 from src.app.task import repository
-from src.app.task.repository import TaskRepository
+from src.app.task.repository import create_task_repository
 from src.app.task.service import TaskService
 
+task_cache = (
+    LRUCache(settings.TASK_CACHE_SIZE, settings.TASK_CACHE_TTL)
+    if settings.TASK_CACHE_SIZE > 0 else None
+)
+
+
+def _task_cache_metrics() -> typing.List[str]:
+    stats = task_cache.stats()
+    return [
+        *format_metric("task_cache_hits_total", "counter", "Task cache hits.", {"": stats["hits"]}),
+        *format_metric("task_cache_misses_total", "counter", "Task cache misses.", {"": stats["misses"]}),
+        *format_metric("task_cache_evictions_total", "counter", "Task cache evictions.", {"": stats["evictions"]}),
+        *format_metric("task_cache_size", "gauge", "Tasks currently cached.", {"": stats["size"]}),
+    ]
+
+
+if task_cache is not None:
+    metrics.add_collector(_task_cache_metrics)
+
+read_coalescer = SingleFlight() if settings.READ_COALESCING_ENABLED else None
+
+
+def _read_coalescing_metrics() -> typing.List[str]:
+    stats = read_coalescer.stats()
+    return [
+        *format_metric("read_coalescing_calls_total", "counter", "Reads that ran a query.", {"": stats["calls"]}),
+        *format_metric("read_coalescing_shared_total", "counter", "Reads served by another in-flight query.",
+                       {"": stats["shared"]}),
+    ]
+
+
+if read_coalescer is not None:
+    metrics.add_collector(_read_coalescing_metrics)
+
+change_feed = (
+    EventBroker(settings.CHANGE_FEED_BUFFER_SIZE, settings.CHANGE_FEED_HISTORY_SIZE, settings.CHANGE_FEED_MAX_SUBSCRIBERS)
+    if settings.CHANGE_FEED_ENABLED else None
+)
+
+
+def _change_feed_metrics() -> typing.List[str]:
+    stats = change_feed.stats()
+    return [
+        *format_metric("change_feed_subscribers", "gauge", "Connected change feed subscribers.",
+                       {"": stats["subscribers"]}),
+        *format_metric("change_feed_events_total", "counter", "Task change events published.",
+                       {"": stats["published"]}),
+        *format_metric("change_feed_disconnects_total", "counter", "Subscribers disconnected for falling behind.",
+                       {"": stats["disconnected"]}),
+    ]
+
+
+if change_feed is not None:
+    metrics.add_collector(_change_feed_metrics)
+
+# One per shard, a batch can only share the transaction of a single database
+write_coalescers = [
+    WriteCoalescer(shard.sessions, settings.WRITE_BATCH_WINDOW, settings.WRITE_BATCH_MAX_SIZE)
+    for shard in shards
+] if settings.WRITE_COALESCING_ENABLED else []
+
 
-async def get_task_repository(db: AsyncSession = Depends(get_db)) -> repository.TaskRepository:
-    return TaskRepository(db)
+async def get_task_repository(
+    dbs: typing.List[AsyncSession] = Depends(get_shard_dbs)
+) -> typing.Union[repository.TaskRepository, repository.ShardedTaskRepository]:
+    return create_task_repository(dbs, write_coalescers)
 
 async def get_task_service(
-    task_repository: repository.TaskRepository = Depends(get_task_repository)
+    task_repository: typing.Union[repository.TaskRepository, repository.ShardedTaskRepository] = Depends(get_task_repository)
 ) -> TaskService:
-    return TaskService(task_repository)
\ No newline at end of file
+    return TaskService(task_repository, cache=task_cache, flights=read_coalescer, events=change_feed)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import contextlib
+import typing
+
+from src.app.core.config import settings
+from src.app.core.database import dispose_engines, shards
+from src.app.core.logging import get_logger
+from src.app.task.importer import FORMATS, TaskImporter, detect_format
+from src.app.task.repository import create_task_repository
+from src.app.task.service import TaskService
+
+logger = get_logger("commands")
+
+
+@contextlib.asynccontextmanager
+async def open_task_repository():
+    # Commands run against every shard
+    async with contextlib.AsyncExitStack() as stack:
+        sessions = [await stack.enter_async_context(shard.sessions()) for shard in shards]
+        yield create_task_repository(sessions)
+
+
+async def rebuild_search_index(args: argparse.Namespace) -> None:
+    async with open_task_repository() as repository:
+        await repository.rebuild_search_index()
+    logger.info("Rebuilt the task search index")
+
+
+async def compact_tombstones(args: argparse.Namespace) -> None:
+    async with open_task_repository() as repository:
+        await TaskService(repository).compact_tombstones(args.older_than_days)
+
+
+async def import_tasks(args: argparse.Namespace) -> None:
+    async with open_task_repository() as repository:
+        importer = TaskImporter(
+            repository,
+            args.path,
+            args.format or detect_format(args.path),
+            rejects_path=args.rejects or f"{args.path}.rejects.ndjson",
+            checkpoint_path=args.checkpoint or f"{args.path}.checkpoint.json",
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            drop_indexes=args.drop_indexes,
+            progress_interval=args.progress_interval,
+        )
+        try:
+            await importer.run(restart=args.restart)
+        except ValueError as e:
+            logger.error("%s", e)
+            raise SystemExit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.app.task.commands", description="Task maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-search-index", help="Re-index all tasks for full-text search")
+    rebuild.set_defaults(handler=rebuild_search_index)
+
+    compact = subparsers.add_parser("compact-tombstones", help="Forget deletions older than the retention period")
+    compact.add_argument(
+        "--older-than-days",
+        type=int,
+        default=settings.TASK_TOMBSTONE_RETENTION_DAYS,
+        help="Clients that last synced before that have to download the full list again",
+    )
+    compact.set_defaults(handler=compact_tombstones)
+
+    load = subparsers.add_parser("import-tasks", help="Load tasks from an NDJSON or CSV file")
+    load.add_argument("path", help="NDJSON with one task object per line, or CSV with a title,description header")
+    load.add_argument("--format", choices=FORMATS, help="Detected from the file extension by default")
+    load.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.TASKS_IMPORT_BATCH_SIZE,
+        help="Records validated together",
+    )
+    load.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.TASKS_IMPORT_CHUNK_SIZE,
+        help="Records per transaction and checkpoint",
+    )
+    load.add_argument(
+        "--drop-indexes",
+        action="store_true",
+        help="Drop the sort and search indexes during the load and rebuild them at the end",
+    )
+    load.add_argument("--rejects", help="Rejected records with their errors, <path>.rejects.ndjson by default")
+    load.add_argument("--checkpoint", help="Indexes dropped for the import, <path>.checkpoint.json by default")
+    load.add_argument("--restart", action="store_true", help="Forget the progress of an earlier run and import from the start")
+    load.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress reports")
+    load.set_defaults(handler=import_tasks)
+
+    return parser
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        await dispose_engines()
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,137 @@
 import typing
 
-from fastapi import APIRouter, Depends, status, Response
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, status, Response
+from fastapi.responses import StreamingResponse
 
-from src.app.core.logging import logger
+from src.app.core import http_cache
+from src.app.core.config import settings
+from src.app.core.encoders import encoders, render_response, stream_response
+from src.app.core.logging import get_logger
 from src.app.dependencies import get_task_service
 from src.app.task import schemas
 from src.app.task.service import TaskService
 
+logger = get_logger("api")
+
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
 @router.get("/", response_model=typing.List[schemas.TaskResponse], status_code=status.HTTP_200_OK)
 async def get_all_tasks(
+        request: Request,
+        limit: int = Query(settings.TASKS_PAGE_SIZE, ge=1, le=settings.TASKS_MAX_PAGE_SIZE),
+        after: typing.Optional[int] = Query(None, ge=0, description="Return tasks after the task with this ID"),
+        after_value: typing.Optional[str] = Query(None, description="Sort field value of the `after` task"),
+        filters: schemas.TaskListFilter = Depends(),
+        fields: typing.Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title"),
         task_service: TaskService = Depends(get_task_service)
-) -> typing.List[schemas.TaskResponse]:
+) -> Response:
     logger.info("API request: GET /tasks")
-    return await task_service.get_all_tasks()
+    encoder = encoders.negotiate(request)
+    selected = task_service.parse_fields(fields)
+    if http_cache.has_preconditions(request):
+        version = await task_service.get_tasks_page_version(limit, after, filters, after_value, selected)
+        etag = http_cache.make_etag(version, encoder.media_type)
+        if http_cache.is_not_modified(request, etag):
+            return http_cache.not_modified(etag)
+
+    page = await task_service.get_tasks_page(limit, after, filters, after_value, selected)
+    # Returned as a prebuilt response, so FastAPI doesn't validate and encode the list again
+    response = render_response(request, encoder, encoder.document(page.items, page.fields))
+    http_cache.set_validators(response, http_cache.make_etag(page.version, encoder.media_type))
+
+    if page.next_cursor is not None:
+        next_params = {"limit": limit, "after": page.next_cursor}
+        if page.next_cursor_value is not None:
+            next_params["after_value"] = page.next_cursor_value
+        next_url = request.url.include_query_params(**next_params)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+        response.headers["X-Next-Cursor"] = str(page.next_cursor)
+
+    return response
+
+
+@router.get("/export", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def export_tasks(
+        request: Request,
+        task_service: TaskService = Depends(get_task_service)
+) -> StreamingResponse:
+    logger.info("API request: GET /tasks/export")
+    encoder = encoders.negotiate(request, default="application/x-ndjson")
+    return await stream_response(request, encoder, task_service.export_tasks())
+
+
+@router.get("/changes", response_model=schemas.TaskChanges, status_code=status.HTTP_200_OK)
+async def get_task_changes(
+        since: typing.Optional[str] = Query(None, description="next_token from the previous sync, omit for a full sync"),
+        limit: int = Query(settings.TASKS_PAGE_SIZE, ge=1, le=settings.TASKS_MAX_PAGE_SIZE),
+        task_service: TaskService = Depends(get_task_service)
+) -> schemas.TaskChanges:
+    logger.info("API request: GET /tasks/changes")
+    return await task_service.get_changes(since, limit)
+
+
+@router.get("/events", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+async def stream_task_events(
+        since: typing.Optional[str] = Query(None, description="Position to resume from, the id of the last event seen"),
+        last_event_id: typing.Optional[str] = Header(None),
+        task_service: TaskService = Depends(get_task_service)
+) -> StreamingResponse:
+    logger.info("API request: GET /tasks/events")
+    # EventSource sends Last-Event-ID by itself when it reconnects
+    return StreamingResponse(
+        task_service.stream_changes(last_event_id or since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/search", response_model=typing.List[schemas.TaskSearchResult], status_code=status.HTTP_200_OK)
+async def search_tasks(
+        request: Request,
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=256, description="Words to search in title and description"),
+        limit: int = Query(settings.TASKS_PAGE_SIZE, ge=1, le=settings.TASKS_MAX_PAGE_SIZE),
+        offset: int = Query(0, ge=0, le=settings.TASKS_SEARCH_MAX_OFFSET),
+        snippets: bool = Query(False, description="Return highlighted snippets of the matched text"),
+        task_service: TaskService = Depends(get_task_service)
+) -> typing.List[schemas.TaskSearchResult]:
+    logger.info("API request: GET /tasks/search")
+    page = await task_service.search_tasks(q, limit, offset, snippets)
+
+    if page.next_offset is not None:
+        next_url = request.url.include_query_params(offset=page.next_offset)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+    return page.items
 
 
 @router.get("/{task_id}", response_model=schemas.TaskResponse, status_code=status.HTTP_200_OK)
 async def get_task(
         task_id: int,
+        request: Request,
+        fields: typing.Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title"),
         task_service: TaskService = Depends(get_task_service)
-) -> schemas.TaskResponse:
-    logger.info(f"API request: GET /tasks/{task_id}")
-    return await task_service.get_task_by_id(task_id)
+) -> Response:
+    logger.info("API request: GET /tasks/%s", task_id)
+    encoder = encoders.negotiate(request)
+    selected = task_service.parse_fields(fields)
+    if http_cache.has_preconditions(request):
+        updated_at = await task_service.get_task_updated_at(task_id)
+        etag = http_cache.make_etag(task_id, updated_at.isoformat(), encoder.media_type, *(selected or ()))
+        if http_cache.is_not_modified(request, etag, updated_at):
+            return http_cache.not_modified(etag, updated_at)
+
+    if selected is None:
+        task = (await task_service.get_task_by_id(task_id)).model_dump()
+    else:
+        task = await task_service.get_task_fields(task_id, selected)
+
+    updated_at = task["updated_at"]
+    response = render_response(request, encoder, encoder.item(task, selected))
+    etag = http_cache.make_etag(task_id, updated_at.isoformat(), encoder.media_type, *(selected or ()))
+    http_cache.set_validators(response, etag, updated_at)
+    return response
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED)
@@ -32,18 +139,46 @@ async def create_task(
         task_data: schemas.TaskCreate,
         task_service: TaskService = Depends(get_task_service)
 ) -> dict:
-    logger.info(f"API request: POST /tasks with data {task_data.model_dump()}")
+    logger.info("API request: POST /tasks/create")
     task = await task_service.create_task(task_data)
     return {"id": task.id}
 
 
+@router.post("/bulk", response_model=schemas.TaskBulkCreateResponse, status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+        tasks_data: typing.List[schemas.TaskBulkCreateItem] = Body(..., min_length=1, max_length=settings.TASKS_BULK_MAX_ITEMS),
+        task_service: TaskService = Depends(get_task_service)
+) -> schemas.TaskBulkCreateResponse:
+    logger.info("API request: POST /tasks/bulk with %s tasks", len(tasks_data))
+    ids = await task_service.create_tasks(tasks_data)
+    return schemas.TaskBulkCreateResponse(ids=ids)
+
+
+@router.put("/bulk", response_model=schemas.TaskBulkResult, status_code=status.HTTP_200_OK)
+async def update_tasks_bulk(
+        tasks_data: typing.List[schemas.TaskBulkUpdateItem] = Body(..., min_length=1, max_length=settings.TASKS_BULK_MAX_ITEMS),
+        task_service: TaskService = Depends(get_task_service)
+) -> schemas.TaskBulkResult:
+    logger.info("API request: PUT /tasks/bulk with %s tasks", len(tasks_data))
+    return await task_service.update_tasks(tasks_data)
+
+
+@router.delete("/bulk", response_model=schemas.TaskBulkResult, status_code=status.HTTP_200_OK)
+async def delete_tasks_bulk(
+        ids: typing.List[int] = Body(..., embed=True, min_length=1, max_length=settings.TASKS_BULK_MAX_ITEMS),
+        task_service: TaskService = Depends(get_task_service)
+) -> schemas.TaskBulkResult:
+    logger.info("API request: DELETE /tasks/bulk with %s ids", len(ids))
+    return await task_service.delete_tasks(ids)
+
+
 @router.put("/update/{task_id}", response_model=schemas.TaskResponse, status_code=status.HTTP_200_OK)
 async def update_task(
         task_id: int,
         task_data: schemas.TaskUpdate,
         task_service: TaskService = Depends(get_task_service)
 ) ->  schemas.TaskResponse:
-    logger.info(f"API request: PUT /tasks/{task_id} with data {task_data.model_dump()}")
+    logger.info("API request: PUT /tasks/update/%s", task_id)
     return await task_service.update_task(task_id, task_data)
 
 
@@ -52,6 +187,6 @@ async def delete_task(
         task_id: int,
         task_service: TaskService = Depends(get_task_service)
 ) -> Response:
-    logger.info(f"API request: DELETE /tasks/{task_id}")
+    logger.info("API request: DELETE /tasks/delete/%s", task_id)
     await task_service.delete_task(task_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -0,0 +1,305 @@
+import csv
+import json
+import os
+import time
+import typing
+from datetime import datetime
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from src.app.core.config import settings
+from src.app.core.logging import get_logger
+from src.app.core.mapper import DTOMapper
+from src.app.task.repository import ShardedTaskRepository, TaskRepository
+from src.app.task.schemas import TaskBulkCreateItem
+
+logger = get_logger("importer")
+
+FORMATS = ("ndjson", "csv")
+
+_task_batch = TypeAdapter(typing.List[TaskBulkCreateItem])
+
+
+class SourceRecord(typing.NamedTuple):
+    line: int
+    # Byte offset right after the record, where a resumed import continues
+    position: int
+    record: typing.Any
+    error: typing.Optional[str] = None
+
+
+class Rejected(typing.NamedTuple):
+    source: SourceRecord
+    errors: typing.List[typing.Dict[str, typing.Any]]
+
+
+class Checkpoint(BaseModel):
+    source: str
+    format: str
+    # DDL of the indexes dropped for the load, kept here so an interrupted run still restores them
+    dropped: typing.Optional[typing.List[str]] = None
+
+
+class ImportProgress(BaseModel):
+    position: int = 0
+    line: int = 0
+    imported: int = 0
+    rejected: int = 0
+    rejects_position: int = 0
+
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def read_records(path: str, file_format: str, position: int = 0, line: int = 0) -> typing.Iterator[SourceRecord]:
+    # Reads the file line by line in binary mode, so the byte position of every record is known
+    with open(path, "rb") as source:
+        if file_format == "ndjson":
+            source.seek(position)
+            for raw in source:
+                position += len(raw)
+                line += 1
+                if not raw.strip():
+                    continue
+                try:
+                    yield SourceRecord(line, position, json.loads(raw))
+                except ValueError as e:
+                    yield SourceRecord(line, position, raw.decode("utf-8", "replace").rstrip("\r\n"), str(e))
+            return
+
+        header_line = source.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+        if position == 0:
+            position, line = len(header_line), 1
+        source.seek(position)
+
+        undecodable = set()
+
+        def lines() -> typing.Iterator[str]:
+            nonlocal position, line
+            for raw in source:
+                position += len(raw)
+                line += 1
+                try:
+                    yield raw.decode("utf-8")
+                except UnicodeDecodeError:
+                    undecodable.add(line)
+                    yield raw.decode("utf-8", "replace")
+
+        # csv pulls the next line only while a quoted field is still open, so after every
+        # row `position` points right behind it, even for multi-line values
+        reader = csv.reader(lines())
+        while True:
+            first_line = line + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield SourceRecord(first_line, position, None, str(e))
+                continue
+            if not row:
+                continue
+            record = dict(zip(header, row))
+            if undecodable.intersection(range(first_line, line + 1)):
+                yield SourceRecord(first_line, position, record, "Invalid UTF-8")
+            else:
+                yield SourceRecord(first_line, position, record)
+
+
+def validate_batch(
+        records: typing.List[SourceRecord],
+) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]], typing.List[Rejected]]:
+    rejected = [Rejected(record, [{"type": "parse_error", "msg": record.error}]) for record in records if record.error]
+    records = [record for record in records if not record.error]
+
+    # One validator call for the whole batch, a second one without the rows it rejected
+    try:
+        tasks = _task_batch.validate_python([record.record for record in records])
+    except ValidationError as e:
+        errors: typing.Dict[int, typing.List[typing.Dict[str, typing.Any]]] = {}
+        for error in e.errors(include_url=False, include_context=False, include_input=False):
+            index, *loc = error["loc"]
+            errors.setdefault(index, []).append({**error, "loc": loc})
+        rejected.extend(Rejected(records[index], errors[index]) for index in sorted(errors))
+        records = [record for index, record in enumerate(records) if index not in errors]
+        tasks = _task_batch.validate_python([record.record for record in records])
+
+    # One timestamp per batch instead of the column defaults, which are called for every row
+    now = datetime.now(settings.TIMEZONE)
+    rows = [{**DTOMapper.create_dto_to_dict(task), "created_at": now, "updated_at": now} for task in tasks]
+    return rows, rejected
+
+
+# Streams a task dump into the database: records are validated in batches and
+# inserted in chunks of one transaction each. Rejected records go to a side file.
+# The position in the file is committed with every chunk, an interrupted run
+# continues after the last committed chunk
+class TaskImporter:
+    def __init__(
+            self,
+            repository: typing.Union[TaskRepository, ShardedTaskRepository],
+            path: str,
+            file_format: str,
+            rejects_path: str,
+            checkpoint_path: str,
+            batch_size: int,
+            chunk_size: int,
+            drop_indexes: bool = False,
+            progress_interval: float = 5.0,
+    ):
+        self.repository = repository
+        self.path = os.path.abspath(path)
+        self.file_format = file_format
+        self.rejects_path = rejects_path
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.drop_indexes = drop_indexes
+        self.progress_interval = progress_interval
+        self.size = os.path.getsize(path)
+
+    def load_checkpoint(self, restart: bool = False) -> Checkpoint:
+        if not os.path.exists(self.checkpoint_path):
+            return Checkpoint(source=self.path, format=self.file_format)
+
+        with open(self.checkpoint_path, "rb") as file:
+            checkpoint = Checkpoint.model_validate_json(file.read())
+        if restart:
+            # Indexes an interrupted run dropped still have to come back
+            return Checkpoint(source=self.path, format=self.file_format, dropped=checkpoint.dropped)
+        if checkpoint.source != self.path or checkpoint.format != self.file_format:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to another import ({checkpoint.source}), "
+                "pass another --checkpoint or --restart"
+            )
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint: Checkpoint) -> None:
+        # Replaced in one step, a crash leaves either the old or the new checkpoint
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(checkpoint.model_dump_json())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.checkpoint_path)
+
+    async def load_progress(self, restart: bool = False) -> typing.Optional[ImportProgress]:
+        if restart:
+            await self.repository.delete_import(self.path)
+            return None
+        task_import = await self.repository.get_import(self.path)
+        if task_import is None:
+            return None
+        progress = ImportProgress.model_validate(task_import, from_attributes=True)
+        if progress.position > self.size:
+            raise ValueError(f"{self.path} is shorter than its imported part, pass --restart to import it again")
+        return progress
+
+    async def run(self, restart: bool = False) -> ImportProgress:
+        checkpoint = self.load_checkpoint(restart)
+        progress = await self.load_progress(restart)
+        if progress is not None and progress.position == self.size and checkpoint.dropped is None:
+            logger.warning("%s was already imported, pass --restart to import it again", self.path)
+            return progress
+        if progress is None:
+            progress = ImportProgress()
+        elif progress.position:
+            logger.info("Resuming the import of %s after line %s", self.path, progress.line)
+
+        if self.drop_indexes and checkpoint.dropped is None:
+            # Saved before anything is dropped, a crash in between can't lose the DDL
+            checkpoint.dropped = await self.repository.get_secondary_indexes()
+            self.save_checkpoint(checkpoint)
+            await self.repository.drop_secondary_indexes()
+            logger.info("Dropped %s secondary indexes for the load", len(checkpoint.dropped))
+
+        started = reported = time.monotonic()
+        imported_before = progress.imported
+        rows: typing.List[typing.Dict[str, typing.Any]] = []
+        rejected: typing.List[Rejected] = []
+        last: typing.Optional[SourceRecord] = None
+
+        with open(self.rejects_path, "ab") as rejects:
+            # Rejects written after the last committed chunk are written again when it is read again
+            rejects.truncate(progress.rejects_position)
+            records = read_records(self.path, self.file_format, progress.position, progress.line)
+            for batch in self._batches(records):
+                valid, invalid = validate_batch(batch)
+                rows.extend(valid)
+                rejected.extend(invalid)
+                last = batch[-1]
+                if len(rows) + len(rejected) < self.chunk_size:
+                    continue
+
+                progress = await self._commit(progress, rows, rejected, last, rejects)
+                rows, rejected = [], []
+                if time.monotonic() - reported >= self.progress_interval:
+                    reported = time.monotonic()
+                    self._report(progress, imported_before, started)
+
+            if rows or rejected:
+                progress = await self._commit(progress, rows, rejected, last, rejects)
+
+        if checkpoint.dropped is not None:
+            logger.info("Rebuilding secondary indexes")
+            await self.repository.restore_secondary_indexes(checkpoint.dropped)
+            checkpoint.dropped = None
+            self.save_checkpoint(checkpoint)
+        self._report(progress, imported_before, started, "Finished importing %s")
+        return progress
+
+    def _batches(self, records: typing.Iterator[SourceRecord]) -> typing.Iterator[typing.List[SourceRecord]]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _commit(
+            self,
+            progress: ImportProgress,
+            rows: typing.List[typing.Dict[str, typing.Any]],
+            rejected: typing.List[Rejected],
+            last: SourceRecord,
+            rejects: typing.BinaryIO,
+    ) -> ImportProgress:
+        for rejected_record in rejected:
+            rejects.write(json.dumps({
+                "line": rejected_record.source.line,
+                "errors": rejected_record.errors,
+                "record": rejected_record.source.record,
+            }, ensure_ascii=False, default=str).encode() + b"\n")
+        # On disk before the chunk commits, so a committed chunk never misses its rejects
+        rejects.flush()
+        os.fsync(rejects.fileno())
+
+        progress = ImportProgress(
+            position=last.position,
+            line=last.line,
+            imported=progress.imported + len(rows),
+            rejected=progress.rejected + len(rejected),
+            rejects_position=rejects.tell(),
+        )
+        await self.repository.import_many(rows, {"source": self.path, **progress.model_dump()})
+        return progress
+
+    def _report(
+            self,
+            progress: ImportProgress,
+            imported_before: int,
+            started: float,
+            message: str = "Imported %s",
+    ) -> None:
+        elapsed = time.monotonic() - started
+        rate = (progress.imported - imported_before) / elapsed if elapsed > 0 else 0.0
+        done = progress.position / self.size * 100 if self.size else 100.0
+        logger.info(
+            message + " tasks, rejected %s, %.0f tasks/s, %.1f%% of the file",
+            progress.imported, progress.rejected, rate, done,
+            extra={"imported": progress.imported, "rejected": progress.rejected, "rate": rate},
+        )
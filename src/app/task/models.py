@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, func, text
 
 from src.app.core.config import settings
 from src.app.core.database import Base
@@ -8,6 +8,12 @@ from src.app.core.database import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_updated_at_id", "updated_at", "id"),
+        Index("ix_tasks_title_id", "title", "id"),
+        Index("ix_tasks_change_seq", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(255), nullable=False)
@@ -22,4 +28,49 @@ class Task(Base):
         default=lambda: datetime.now(settings.TIMEZONE),
         onupdate=lambda: datetime.now(settings.TIMEZONE),
         nullable=False,
-    )
\ No newline at end of file
+    )
+    # Assigned by triggers from the delta sync migration on every insert and update
+    change_seq = Column(Integer, nullable=False, server_default=text("0"))
+
+
+class TaskTombstone(Base):
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_change_seq", "change_seq"),
+    )
+
+    # Written by a trigger in the same transaction as the delete
+    task_id = Column(Integer, primary_key=True, autoincrement=False)
+    change_seq = Column(Integer, nullable=False)
+    # UTC, set by SQLite
+    deleted_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+class TaskSyncState(Base):
+    __tablename__ = "task_sync_state"
+
+    # A single row: the last change sequence handed out and the newest compacted tombstone
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    change_seq = Column(Integer, nullable=False)
+    compacted_seq = Column(Integer, nullable=False)
+
+
+class TaskIdSequence(Base):
+    __tablename__ = "task_id_sequence"
+
+    # A single row: the last task id handed out in sharded mode, where ids encode the shard
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    last_id = Column(Integer, nullable=False)
+
+
+class TaskImport(Base):
+    __tablename__ = "task_imports"
+
+    # Progress of an import-tasks run, committed in the same transaction as the chunk it covers
+    source = Column(String(1024), primary_key=True)
+    position = Column(Integer, nullable=False)
+    line = Column(Integer, nullable=False)
+    imported = Column(Integer, nullable=False)
+    rejected = Column(Integer, nullable=False)
+    # Size of the rejects file after this chunk, a resumed run cuts off anything written later
+    rejects_position = Column(Integer, nullable=False)
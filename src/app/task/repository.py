@@ -1,51 +1,682 @@
+import asyncio
+import heapq
+import itertools
 import typing
 from datetime import datetime
 
-from sqlalchemy import select, update, delete
+from sqlalchemy import (
+    Select, select, insert, update, delete, func, table, column, literal_column, text, tuple_, and_, or_, bindparam,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.core.batching import WriteCoalescer
 from src.app.core.config import settings
+from src.app.core.sharding import shard_id_range, shard_of
 from src.app.task import models
 from src.app.task.models import Task
+from src.app.task.schemas import TaskListFilter, TaskSort
+
+# Maintained by triggers from the full-text search migration, not part of the ORM metadata
+tasks_fts = table("tasks_fts", column("rowid"))
+tasks_fts_match = literal_column("tasks_fts")
+# Title matches weigh more than description matches
+tasks_fts_rank = func.bm25(tasks_fts_match, 10.0, 1.0)
+
+sqlite_master = table("sqlite_master", column("type"), column("name"), column("tbl_name"), column("sql"))
+# Objects that only serve reads: the sort and change indexes and the search index triggers.
+# The delta sync triggers stay, every change has to get its sequence number
+secondary_schema = (
+    select(sqlite_master.c.type, sqlite_master.c.name, sqlite_master.c.sql)
+    .where(sqlite_master.c.tbl_name == "tasks", sqlite_master.c.sql.is_not(None))
+    .where(or_(
+        sqlite_master.c.type == "index",
+        and_(sqlite_master.c.type == "trigger", sqlite_master.c.name.like("tasks_fts_%")),
+    ))
+    .order_by(sqlite_master.c.type, sqlite_master.c.name)
+)
+
+# Same order as the TaskResponse fields, so rows serialize exactly like the models
+TASK_ROW_COLUMNS = (
+    models.Task.title,
+    models.Task.description,
+    models.Task.id,
+    models.Task.created_at,
+    models.Task.updated_at,
+)
 
 
 class TaskRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(
+            self,
+            db: AsyncSession,
+            write_coalescer: typing.Optional[WriteCoalescer] = None,
+            shard: typing.Optional[int] = None,
+    ):
         self.db = db
+        self.write_coalescer = write_coalescer
+        # Set in sharded mode, where new ids are allocated from the shard's id range
+        self.shard = shard
 
-    async def get_all(self) -> typing.List[models.Task]:
-        result = await self.db.execute(select(models.Task))
-        return result.scalars().all()
+    @property
+    def shards(self) -> typing.List["TaskRepository"]:
+        return [self]
+
+    async def _release(self) -> None:
+        # Ends the read transaction as soon as the result is materialized, so the connection
+        # goes back to the pool now instead of when the response is sent. The session checks
+        # out a connection again only when the next statement runs; loaded objects stay usable
+        await self.db.close()
+
+    async def get_page(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[TaskListFilter] = None,
+            after_value: typing.Any = None,
+            fields: typing.Optional[typing.Sequence[str]] = None,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        # Plain column rows skip ORM identity-map bookkeeping for read-only pages
+        result = await self.db.execute(
+            self._page_query(select(*self._columns(fields)), limit, after, filters, after_value)
+        )
+        keys = tuple(result.keys())
+        rows = [dict(zip(keys, row)) for row in result]
+        await self._release()
+        return rows
+
+    async def get_page_fingerprint(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[TaskListFilter] = None,
+            after_value: typing.Any = None,
+    ) -> typing.Tuple[int, typing.Optional[datetime], typing.Optional[int]]:
+        page = self._page_query(
+            select(models.Task.id, models.Task.updated_at), limit, after, filters, after_value
+        ).subquery()
+        result = await self.db.execute(
+            select(func.count(), func.max(page.c.updated_at), func.sum(page.c.id))
+        )
+        fingerprint = tuple(result.one())
+        await self._release()
+        return fingerprint
+
+    @staticmethod
+    def _page_query(
+            query: Select,
+            limit: int,
+            after: typing.Optional[int],
+            filters: typing.Optional[TaskListFilter] = None,
+            after_value: typing.Any = None,
+    ) -> Select:
+        # Every sort walks one of the (column, id) indexes, and range filters are only
+        # accepted on the sort column, so pages never need a scan or a temporary sort
+        filters = filters or TaskListFilter()
+        sort = filters.sort or TaskSort.ID
+        column = getattr(models.Task, sort.field)
+
+        for field, (lower, upper) in filters.ranges().items():
+            filtered = getattr(models.Task, field)
+            if lower is not None:
+                query = query.where(filtered >= lower)
+            if upper is not None:
+                query = query.where(filtered < upper)
+
+        if after is not None:
+            key = models.Task.id if sort.field == "id" else tuple_(column, models.Task.id)
+            cursor = after if sort.field == "id" else tuple_(after_value, after)
+            query = query.where(key < cursor if sort.descending else key > cursor)
+
+        order = [column] if sort.field == "id" else [column, models.Task.id]
+        if sort.descending:
+            order = [part.desc() for part in order]
+
+        return query.order_by(*order).limit(limit)
+
+    async def stream_all(self) -> typing.AsyncIterator[typing.List[typing.Dict[str, typing.Any]]]:
+        result = await self.db.stream(
+            select(*TASK_ROW_COLUMNS)
+            .order_by(models.Task.id)
+            .execution_options(yield_per=settings.TASKS_EXPORT_BATCH_SIZE)
+        )
+        try:
+            keys = tuple(result.keys())
+            async for rows in result.partitions():
+                yield [dict(zip(keys, row)) for row in rows]
+        finally:
+            await self._release()
+
+    async def get_sync_state(self) -> typing.Tuple[int, int]:
+        result = await self.db.execute(
+            select(models.TaskSyncState.change_seq, models.TaskSyncState.compacted_seq)
+            .where(models.TaskSyncState.id == 1)
+        )
+        state = tuple(result.one())
+        await self._release()
+        return state
+
+    async def get_changes(
+            self,
+            since: int,
+            until: int,
+            limit: int,
+            include_deleted: bool = True,
+    ) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]], typing.List[typing.Tuple[int, int]]]:
+        # Both lists walk a change_seq index, so the cost follows the number of changes, not the table size
+        result = await self.db.execute(
+            select(*TASK_ROW_COLUMNS, models.Task.change_seq)
+            .where(models.Task.change_seq > since, models.Task.change_seq <= until)
+            .order_by(models.Task.change_seq)
+            .limit(limit)
+        )
+        keys = tuple(result.keys())
+        changed = [dict(zip(keys, row)) for row in result]
+
+        deleted = []
+        if include_deleted:
+            result = await self.db.execute(
+                select(models.TaskTombstone.task_id, models.TaskTombstone.change_seq)
+                .where(models.TaskTombstone.change_seq > since, models.TaskTombstone.change_seq <= until)
+                .order_by(models.TaskTombstone.change_seq)
+                .limit(limit)
+            )
+            deleted = [tuple(row) for row in result]
+        await self._release()
+        return changed, deleted
+
+    async def compact_tombstones(self, deleted_before: datetime) -> int:
+        # Removes whole sequence ranges, so every token below compacted_seq is known to be incomplete
+        result = await self.db.execute(
+            select(func.max(models.TaskTombstone.change_seq))
+            .where(models.TaskTombstone.deleted_at < deleted_before)
+        )
+        horizon = result.scalar()
+        if horizon is None:
+            await self._release()
+            return 0
+
+        result = await self.db.execute(
+            delete(models.TaskTombstone)
+            .where(models.TaskTombstone.change_seq <= horizon)
+        )
+        await self.db.execute(
+            update(models.TaskSyncState)
+            .where(models.TaskSyncState.id == 1)
+            .values(compacted_seq=func.max(models.TaskSyncState.compacted_seq, horizon))
+        )
+        await self.db.commit()
+        return result.rowcount
+
+    async def search(
+            self,
+            query: str,
+            limit: int,
+            offset: int = 0,
+            snippets: bool = False,
+    ) -> typing.List[typing.Tuple[models.Task, typing.Optional[str]]]:
+        result = await self.db.execute(self._search_query(query, limit, offset, snippets))
+        hits = [tuple(row) for row in result.all()]
+        await self._release()
+        return hits
+
+    async def search_ranked(
+            self,
+            query: str,
+            limit: int,
+            offset: int = 0,
+            snippets: bool = False,
+    ) -> typing.List[typing.Tuple[models.Task, typing.Optional[str], float]]:
+        result = await self.db.execute(self._search_query(query, limit, offset, snippets, tasks_fts_rank))
+        hits = [tuple(row) for row in result.all()]
+        await self._release()
+        return hits
+
+    # FTS5 scores every match before sorting, and OFFSET drops rows that were already ranked:
+    # a page costs O(matches + offset), the sharded search asks each shard for offset + limit
+    # hits. The API caps offset at TASKS_SEARCH_MAX_OFFSET to bound the deep pages
+    @staticmethod
+    def _search_query(query: str, limit: int, offset: int, snippets: bool, *columns: typing.Any) -> Select:
+        snippet = (
+            func.snippet(tasks_fts_match, -1, "<mark>", "</mark>", "…", 16)
+            if snippets else literal_column("NULL")
+        )
+        return (
+            select(models.Task, snippet, *columns)
+            .join(tasks_fts, tasks_fts.c.rowid == models.Task.id)
+            .where(tasks_fts_match.match(query))
+            .order_by(tasks_fts_rank, models.Task.id)
+            .limit(limit)
+            .offset(offset)
+        )
+
+    async def rebuild_search_index(self) -> None:
+        await self.db.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+        await self.db.commit()
+
+    async def get_secondary_indexes(self) -> typing.List[str]:
+        # DDL of the objects drop_secondary_indexes removes, for restore_secondary_indexes
+        result = await self.db.execute(secondary_schema)
+        ddl = [sql for _, _, sql in result.all()]
+        await self._release()
+        return ddl
+
+    async def drop_secondary_indexes(self) -> None:
+        result = await self.db.execute(secondary_schema)
+        connection = await self.db.connection()
+        for object_type, name, _ in result.all():
+            await connection.exec_driver_sql(f'DROP {object_type.upper()} IF EXISTS "{name}"')
+        await self.db.commit()
+
+    async def restore_secondary_indexes(self, ddl: typing.Sequence[str]) -> None:
+        # Objects already restored by an interrupted run are skipped
+        result = await self.db.execute(select(sqlite_master.c.sql))
+        existing = set(result.scalars())
+        connection = await self.db.connection()
+        for statement in ddl:
+            if statement not in existing:
+                await connection.exec_driver_sql(statement)
+        # Rows loaded while the triggers were gone are missing from the search index
+        await connection.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+        await self.db.commit()
 
     async def get_by_id(self, task_id: int) -> typing.Optional[models.Task]:
         result = await self.db.execute(
             select(models.Task)
             .where(models.Task.id == task_id)
         )
-        return result.scalars().first()
+        task = result.scalars().first()
+        await self._release()
+        return task
+
+    async def get_fields_by_id(
+            self,
+            task_id: int,
+            fields: typing.Sequence[str],
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        result = await self.db.execute(
+            select(*self._columns(fields))
+            .where(models.Task.id == task_id)
+        )
+        keys = tuple(result.keys())
+        row = result.first()
+        await self._release()
+        return dict(zip(keys, row)) if row is not None else None
+
+    @staticmethod
+    def _columns(fields: typing.Optional[typing.Sequence[str]]) -> typing.Sequence[typing.Any]:
+        if fields is None:
+            return TASK_ROW_COLUMNS
+        return [getattr(models.Task, field) for field in fields]
+
+    async def get_updated_at(self, task_id: int) -> typing.Optional[datetime]:
+        result = await self.db.execute(
+            select(models.Task.updated_at)
+            .where(models.Task.id == task_id)
+        )
+        updated_at = result.scalars().first()
+        await self._release()
+        return updated_at
 
     async def create(self, task_data: dict[str, typing.Any]) -> models.Task:
-        task = Task(**task_data)
-        self.db.add(task)
+        if self.write_coalescer is not None:
+            return await self.write_coalescer.submit(lambda session: self._insert(session, task_data, self.shard))
+
+        task = await self._insert(self.db, task_data, self.shard)
         await self.db.commit()
         await self.db.refresh(task)
+        await self._release()
+        return task
+
+    @staticmethod
+    async def _insert(
+            db: AsyncSession,
+            task_data: dict[str, typing.Any],
+            shard: typing.Optional[int] = None,
+    ) -> models.Task:
+        if shard is not None:
+            task_data = {**task_data, "id": (await TaskRepository._allocate_ids(db, shard, 1))[0]}
+        task = Task(**task_data)
+        db.add(task)
+        await db.flush()
         return task
 
+    @staticmethod
+    async def _allocate_ids(db: AsyncSession, shard: int, count: int) -> range:
+        # Runs first in the inserting transaction, so SQLite's write lock keeps concurrent
+        # workers from getting the same ids. The highest existing id covers a shard that
+        # started out as a single database with SQLite-assigned ids
+        floor, ceiling = shard_id_range(shard)
+        highest = (
+            select(func.coalesce(func.max(models.Task.id), 0))
+            .where(models.Task.id < ceiling)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(models.TaskIdSequence)
+            .where(models.TaskIdSequence.id == 1)
+            .values(last_id=func.max(models.TaskIdSequence.last_id, floor, highest) + count)
+            .returning(models.TaskIdSequence.last_id)
+        )
+        last_id = result.scalar_one()
+        if last_id >= ceiling:
+            raise RuntimeError(f"Shard {shard} has run out of task ids")
+        return range(last_id - count + 1, last_id + 1)
+
+    async def create_many(self, tasks_data: typing.List[dict[str, typing.Any]]) -> typing.List[int]:
+        ids = await self._insert_many(tasks_data)
+        await self.db.commit()
+
+        return ids
+
+    async def _insert_many(self, tasks_data: typing.List[dict[str, typing.Any]]) -> typing.List[int]:
+        if not tasks_data:
+            return []
+        # Ids are handed out up front, so they follow the input order by construction.
+        # SQLite doesn't order RETURNING rows, and asking SQLAlchemy to sort them makes
+        # it insert one row per statement
+        allocated = await self._allocate_ids(self.db, self.shard or 0, len(tasks_data))
+        tasks_data = [{**task_data, "id": task_id} for task_data, task_id in zip(tasks_data, allocated)]
+
+        chunk_size = settings.TASKS_BULK_CHUNK_SIZE
+        for start in range(0, len(tasks_data), chunk_size):
+            # RETURNING is what lets SQLAlchemy batch the rows into multi-row INSERTs
+            await self.db.execute(
+                insert(models.Task).returning(models.Task.id),
+                tasks_data[start:start + chunk_size],
+            )
+        return list(allocated)
+
+    async def get_import(self, source: str) -> typing.Optional[models.TaskImport]:
+        task_import = await self.db.get(models.TaskImport, source)
+        await self._release()
+        return task_import
+
+    async def import_many(
+            self,
+            tasks_data: typing.List[dict[str, typing.Any]],
+            progress: typing.Dict[str, typing.Any],
+    ) -> typing.List[int]:
+        # The chunk and the import position commit together, a resumed import never repeats rows
+        ids = await self._insert_many(tasks_data)
+        statement = sqlite_insert(models.TaskImport).values(**progress)
+        await self.db.execute(statement.on_conflict_do_update(
+            index_elements=[models.TaskImport.source],
+            set_={name: statement.excluded[name] for name in progress if name != "source"},
+        ))
+        await self.db.commit()
+
+        return ids
+
+    async def delete_import(self, source: str) -> None:
+        await self.db.execute(delete(models.TaskImport).where(models.TaskImport.source == source))
+        await self.db.commit()
+
     async def update(self, task_id: int, task_data: dict[str, typing.Any]) -> typing.Optional[models.Task]:
         task_data['updated_at'] = datetime.now(settings.TIMEZONE)
 
-        await self.db.execute(
+        if self.write_coalescer is not None:
+            return await self.write_coalescer.submit(lambda session: self._update(session, task_id, task_data))
+
+        task = await self._update(self.db, task_id, task_data)
+        await self.db.commit()
+
+        return task
+
+    @staticmethod
+    async def _update(db: AsyncSession, task_id: int, task_data: dict[str, typing.Any]) -> typing.Optional[models.Task]:
+        result = await db.execute(
             update(models.Task)
             .where(models.Task.id == task_id)
             .values(**task_data)
+            .returning(models.Task)
         )
-        await self.db.commit()
+        return result.scalars().first()
 
-        return await self.get_by_id(task_id)
+    async def update_many(self, tasks_data: typing.Dict[int, dict[str, typing.Any]]) -> typing.List[int]:
+        updated = []
+        task_ids = list(tasks_data)
+        chunk_size = settings.TASKS_BULK_CHUNK_SIZE
+        for start in range(0, len(task_ids), chunk_size):
+            groups: typing.Dict[tuple, typing.List[int]] = {}
+            for task_id in task_ids[start:start + chunk_size]:
+                groups.setdefault(tuple(sorted(tasks_data[task_id].items())), []).append(task_id)
 
-    async def delete(self, task_id: int) -> None:
-        await self.db.execute(
+            now = datetime.now(settings.TIMEZONE)
+            single = {}
+            for patch, group_ids in groups.items():
+                if len(group_ids) == 1:
+                    single[group_ids[0]] = dict(patch)
+                    continue
+                # Tasks getting the same patch share one UPDATE ... WHERE id IN (...)
+                result = await self.db.execute(
+                    update(models.Task)
+                    .where(models.Task.id.in_(group_ids))
+                    .values(**dict(patch), updated_at=now)
+                    .returning(models.Task.id)
+                )
+                updated.extend(result.scalars().all())
+            if single:
+                updated.extend(await self._update_each(single, now))
+            await self.db.commit()
+
+        return updated
+
+    async def _update_each(self, tasks_data: typing.Dict[int, dict[str, typing.Any]], now: datetime) -> typing.List[int]:
+        # Patches that differ per task go out as one executemany per set of fields:
+        # a statement per task would cost a round trip to the driver thread each
+        tasks = models.Task.__table__
+        by_fields: typing.Dict[tuple, typing.List[dict[str, typing.Any]]] = {}
+        for task_id, task_data in tasks_data.items():
+            by_fields.setdefault(tuple(sorted(task_data)), []).append(
+                {**task_data, "task_id": task_id, "updated_at": now}
+            )
+        for params in by_fields.values():
+            await self.db.execute(update(tasks).where(tasks.c.id == bindparam("task_id")), params)
+
+        # Still on the writer inside the same transaction: SQLite's write lock is held since
+        # the first UPDATE, so the tasks that exist now are exactly the ones it changed
+        result = await self.db.execute(select(models.Task.id).where(models.Task.id.in_(list(tasks_data))))
+        return result.scalars().all()
+
+    async def delete_many(self, task_ids: typing.List[int]) -> typing.List[int]:
+        deleted = []
+        chunk_size = settings.TASKS_BULK_CHUNK_SIZE
+        for start in range(0, len(task_ids), chunk_size):
+            result = await self.db.execute(
+                delete(models.Task)
+                .where(models.Task.id.in_(task_ids[start:start + chunk_size]))
+                .returning(models.Task.id)
+            )
+            deleted.extend(result.scalars().all())
+            await self.db.commit()
+
+        return deleted
+
+    async def delete(self, task_id: int) -> bool:
+        result = await self.db.execute(
             delete(models.Task)
             .where(models.Task.id == task_id)
+            .returning(models.Task.id)
+        )
+        deleted_id = result.scalars().first()
+        await self.db.commit()
+
+        return deleted_id is not None
+
+
+# Point operations go to the shard encoded in the task id, lists and searches run
+# on every shard concurrently and are merged in the order a single database returns
+class ShardedTaskRepository:
+    # Process-wide, so single creates from consecutive requests land on different shards
+    _placement = itertools.count()
+
+    def __init__(self, shards: typing.List[TaskRepository]):
+        self.shards = shards
+
+    def _route(self, task_id: int) -> typing.Optional[TaskRepository]:
+        shard = shard_of(task_id)
+        return self.shards[shard] if 0 <= shard < len(self.shards) else None
+
+    def _place(self) -> TaskRepository:
+        return self.shards[next(self._placement) % len(self.shards)]
+
+    def _by_shard(self, task_ids: typing.Iterable[int]) -> typing.Dict[int, typing.List[int]]:
+        # Ids of shards that don't exist can't match a task and are left out
+        grouped: typing.Dict[int, typing.List[int]] = {}
+        for task_id in task_ids:
+            shard = shard_of(task_id)
+            if 0 <= shard < len(self.shards):
+                grouped.setdefault(shard, []).append(task_id)
+        return grouped
+
+    async def get_page(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[TaskListFilter] = None,
+            after_value: typing.Any = None,
+            fields: typing.Optional[typing.Sequence[str]] = None,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        # Each shard returns its own first page, the global page is the head of their merge
+        sort = (filters.sort if filters else None) or TaskSort.ID
+        columns = None if fields is None else tuple(dict.fromkeys((*fields, "id", sort.field)))
+        pages = await asyncio.gather(*(
+            shard.get_page(limit, after, filters, after_value, columns) for shard in self.shards
+        ))
+
+        if sort.field == "id":
+            key = lambda row: row["id"]
+        else:
+            key = lambda row: (row[sort.field], row["id"])
+        rows = list(itertools.islice(heapq.merge(*pages, key=key, reverse=sort.descending), limit))
+        if columns is not None and len(columns) != len(fields):
+            rows = [{field: row[field] for field in fields} for row in rows]
+        return rows
+
+    async def get_page_fingerprint(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[TaskListFilter] = None,
+            after_value: typing.Any = None,
+    ) -> typing.Tuple[int, typing.Optional[datetime], typing.Optional[int]]:
+        rows = await self.get_page(limit, after, filters, after_value, ("id", "updated_at"))
+        if not rows:
+            return 0, None, None
+        return len(rows), max(row["updated_at"] for row in rows), sum(row["id"] for row in rows)
+
+    async def stream_all(self) -> typing.AsyncIterator[typing.List[typing.Dict[str, typing.Any]]]:
+        # Ids start with the shard number, so one shard after another is id order
+        for shard in self.shards:
+            async for rows in shard.stream_all():
+                yield rows
+
+    async def compact_tombstones(self, deleted_before: datetime) -> int:
+        removed = await asyncio.gather(*(shard.compact_tombstones(deleted_before) for shard in self.shards))
+        return sum(removed)
+
+    async def search(
+            self,
+            query: str,
+            limit: int,
+            offset: int = 0,
+            snippets: bool = False,
+    ) -> typing.List[typing.Tuple[models.Task, typing.Optional[str]]]:
+        # Every shard has to return its hits up to offset + limit for the merged page to be exact.
+        # bm25 uses each shard's own term statistics, with tasks spread evenly they are close
+        results = await asyncio.gather(*(
+            shard.search_ranked(query, offset + limit, 0, snippets) for shard in self.shards
+        ))
+        hits = heapq.merge(*results, key=lambda hit: (hit[2], hit[0].id))
+        return [(task, snippet) for task, snippet, _ in itertools.islice(hits, offset, offset + limit)]
+
+    async def rebuild_search_index(self) -> None:
+        await asyncio.gather(*(shard.rebuild_search_index() for shard in self.shards))
+
+    async def get_secondary_indexes(self) -> typing.List[str]:
+        # Every shard has the same schema
+        return await self.shards[0].get_secondary_indexes()
+
+    async def drop_secondary_indexes(self) -> None:
+        await asyncio.gather(*(shard.drop_secondary_indexes() for shard in self.shards))
+
+    async def restore_secondary_indexes(self, ddl: typing.Sequence[str]) -> None:
+        await asyncio.gather(*(shard.restore_secondary_indexes(ddl) for shard in self.shards))
+
+    async def get_by_id(self, task_id: int) -> typing.Optional[models.Task]:
+        shard = self._route(task_id)
+        return await shard.get_by_id(task_id) if shard is not None else None
+
+    async def get_fields_by_id(
+            self,
+            task_id: int,
+            fields: typing.Sequence[str],
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        shard = self._route(task_id)
+        return await shard.get_fields_by_id(task_id, fields) if shard is not None else None
+
+    async def get_updated_at(self, task_id: int) -> typing.Optional[datetime]:
+        shard = self._route(task_id)
+        return await shard.get_updated_at(task_id) if shard is not None else None
+
+    async def create(self, task_data: dict[str, typing.Any]) -> models.Task:
+        return await self._place().create(task_data)
+
+    async def create_many(self, tasks_data: typing.List[dict[str, typing.Any]]) -> typing.List[int]:
+        # One shard keeps the batch in a single transaction, concurrent batches still spread out
+        return await self._place().create_many(tasks_data)
+
+    async def get_import(self, source: str) -> typing.Optional[models.TaskImport]:
+        # Chunks go to the shards in turn, so the furthest position is the last committed chunk
+        imports = await asyncio.gather(*(shard.get_import(source) for shard in self.shards))
+        return max(
+            (task_import for task_import in imports if task_import is not None),
+            key=lambda task_import: task_import.position,
+            default=None,
         )
-        await self.db.commit()
\ No newline at end of file
+
+    async def import_many(
+            self,
+            tasks_data: typing.List[dict[str, typing.Any]],
+            progress: typing.Dict[str, typing.Any],
+    ) -> typing.List[int]:
+        return await self._place().import_many(tasks_data, progress)
+
+    async def delete_import(self, source: str) -> None:
+        await asyncio.gather(*(shard.delete_import(source) for shard in self.shards))
+
+    async def update(self, task_id: int, task_data: dict[str, typing.Any]) -> typing.Optional[models.Task]:
+        shard = self._route(task_id)
+        return await shard.update(task_id, task_data) if shard is not None else None
+
+    async def update_many(self, tasks_data: typing.Dict[int, dict[str, typing.Any]]) -> typing.List[int]:
+        results = await asyncio.gather(*(
+            self.shards[shard].update_many({task_id: tasks_data[task_id] for task_id in task_ids})
+            for shard, task_ids in self._by_shard(tasks_data).items()
+        ))
+        return [task_id for updated in results for task_id in updated]
+
+    async def delete_many(self, task_ids: typing.List[int]) -> typing.List[int]:
+        results = await asyncio.gather(*(
+            self.shards[shard].delete_many(shard_task_ids)
+            for shard, shard_task_ids in self._by_shard(task_ids).items()
+        ))
+        return [task_id for deleted in results for task_id in deleted]
+
+    async def delete(self, task_id: int) -> bool:
+        shard = self._route(task_id)
+        return await shard.delete(task_id) if shard is not None else False
+
+
+def create_task_repository(
+        sessions: typing.Sequence[AsyncSession],
+        write_coalescers: typing.Sequence[WriteCoalescer] = (),
+) -> typing.Union[TaskRepository, ShardedTaskRepository]:
+    coalescers = list(write_coalescers) or [None] * len(sessions)
+    if len(sessions) == 1:
+        return TaskRepository(sessions[0], write_coalescer=coalescers[0])
+    return ShardedTaskRepository([
+        TaskRepository(session, write_coalescer=coalescer, shard=shard)
+        for shard, (session, coalescer) in enumerate(zip(sessions, coalescers))
+    ])
@@ -1,6 +1,10 @@
+import enum
+import typing
 from datetime import datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from src.app.core.config import settings
 
 
 class TaskBase(BaseModel):
@@ -10,9 +14,16 @@ class TaskBase(BaseModel):
 class TaskCreate(TaskBase):
     pass
 
+class TaskBulkCreateItem(TaskCreate):
+    # The column is NOT NULL, a missing description would fail the whole batch on insert
+    description: str = Field(..., max_length=1024, description="Task description")
+
 class TaskUpdate(TaskBase):
     pass
 
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
 class TaskInDB(TaskBase):
     id: int
     created_at: datetime
@@ -22,4 +33,81 @@ class TaskInDB(TaskBase):
         from_attributes = True
 
 class TaskResponse(TaskInDB):
-    pass
\ No newline at end of file
+    pass
+
+class TaskPage(BaseModel):
+    items: typing.List[typing.Dict[str, typing.Any]]
+    next_cursor: typing.Optional[int] = None
+    next_cursor_value: typing.Optional[str] = None
+    fields: typing.Optional[typing.Tuple[str, ...]] = None
+    version: str
+
+
+class TaskSort(str, enum.Enum):
+    ID = "id"
+    ID_DESC = "-id"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    UPDATED_AT = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
+    TITLE = "title"
+    TITLE_DESC = "-title"
+
+    @property
+    def field(self) -> str:
+        return self.value.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.value.startswith("-")
+
+
+class TaskListFilter(BaseModel):
+    sort: typing.Optional[TaskSort] = Field(None, description="Sort field, prefix with '-' for descending order")
+    created_from: typing.Optional[datetime] = Field(None, description="Created at or after")
+    created_to: typing.Optional[datetime] = Field(None, description="Created before")
+    updated_from: typing.Optional[datetime] = Field(None, description="Updated at or after")
+    updated_to: typing.Optional[datetime] = Field(None, description="Updated before")
+    title_from: typing.Optional[str] = Field(None, max_length=255, description="Title at or after, alphabetically")
+    title_to: typing.Optional[str] = Field(None, max_length=255, description="Title before, alphabetically")
+
+    @field_validator("created_from", "created_to", "updated_from", "updated_to")
+    @classmethod
+    def to_storage_timezone(cls, value: typing.Optional[datetime]) -> typing.Optional[datetime]:
+        # Timestamps are stored without an offset in settings.TIMEZONE
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(settings.TIMEZONE).replace(tzinfo=None)
+        return value
+
+    def ranges(self) -> typing.Dict[str, typing.Tuple[typing.Any, typing.Any]]:
+        bounds = {
+            "created_at": (self.created_from, self.created_to),
+            "updated_at": (self.updated_from, self.updated_to),
+            "title": (self.title_from, self.title_to),
+        }
+        return {field: bound for field, bound in bounds.items() if bound != (None, None)}
+
+
+class TaskSearchResult(TaskResponse):
+    snippet: typing.Optional[str] = None
+
+
+class TaskSearchPage(BaseModel):
+    items: typing.List[TaskSearchResult]
+    next_offset: typing.Optional[int] = None
+
+
+class TaskChanges(BaseModel):
+    items: typing.List[TaskResponse] = Field(description="Tasks created or updated since the token")
+    deleted: typing.List[int] = Field(description="Ids of tasks deleted since the token")
+    next_token: str = Field(description="Pass as since on the next sync")
+    has_more: bool = Field(description="More changes are waiting, sync again with next_token right away")
+
+
+class TaskBulkCreateResponse(BaseModel):
+    ids: typing.List[int]
+
+
+class TaskBulkResult(BaseModel):
+    ids: typing.List[int]
+    missing: typing.List[int]
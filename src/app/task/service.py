@@ -1,69 +1,514 @@
+import asyncio
 import typing
+from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException, status
 
-from src.app.core.logging import logger
-from src.app.core.mapper import DTOMapper
+from src.app.core.cache import Cache
+from src.app.core.config import settings
+from src.app.core.events import EventBroker, sse_stream
+from src.app.core.logging import get_logger
+from src.app.core.mapper import DTOMapper, TASK_FIELDS
+from src.app.core.singleflight import SingleFlight
 from src.app.task import schemas
 from src.app.task.repository import TaskRepository
 
+logger = get_logger("service")
+
+# Single-flight keys that depend on one task only; any other read can change with every write
+_TASK_KEYS = frozenset({"task", "task_fields", "updated_at"})
+
 
 class TaskService:
-    def __init__(self, task_repository: TaskRepository):
+    def __init__(
+            self,
+            task_repository: TaskRepository,
+            cache: typing.Optional[Cache[int, schemas.TaskResponse]] = None,
+            flights: typing.Optional[SingleFlight] = None,
+            events: typing.Optional[EventBroker] = None,
+    ):
         self.task_repository = task_repository
+        self.cache = cache
+        self.flights = flights
+        self.events = events
+
+    async def _coalesce(
+            self,
+            key: typing.Hashable,
+            load: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ) -> typing.Any:
+        # Identical concurrent reads share one query and one mapped result
+        if self.flights is None:
+            return await load()
+        return await self.flights.do(key, load)
+
+    async def get_tasks_page(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[schemas.TaskListFilter] = None,
+            after_value: typing.Optional[str] = None,
+            fields: typing.Optional[typing.Tuple[str, ...]] = None,
+    ) -> schemas.TaskPage:
+        logger.info("Fetching tasks page: limit=%s, after=%s", limit, after)
+        filters = self._resolve_filters(filters)
+        cursor_value = self._cursor_value(filters.sort, after, after_value)
+        return await self._coalesce(
+            ("page", limit, after, filters.model_dump_json(), cursor_value, fields),
+            lambda: self._load_page(limit, after, filters, cursor_value, fields),
+        )
+
+    async def _load_page(
+            self,
+            limit: int,
+            after: typing.Optional[int],
+            filters: schemas.TaskListFilter,
+            cursor_value: typing.Any,
+            fields: typing.Optional[typing.Tuple[str, ...]],
+    ) -> schemas.TaskPage:
+        # The page version and the next cursor need these columns even when they aren't returned
+        columns = self._with_fields(fields, "id", "updated_at", filters.sort.field)
+        # One extra row tells us whether another page exists without a COUNT query
+        tasks = await self.task_repository.get_page(limit + 1, after, filters, cursor_value, columns)
+        version = self._page_version(
+            limit, after, filters, cursor_value, fields,
+            len(tasks),
+            max((task["updated_at"] for task in tasks), default=None),
+            sum(task["id"] for task in tasks),
+        )
+
+        next_cursor = None
+        next_cursor_value = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = tasks[-1]["id"]
+            if filters.sort.field != "id":
+                value = tasks[-1][filters.sort.field]
+                next_cursor_value = value.isoformat() if isinstance(value, datetime) else value
+        logger.info("Retrieved %s tasks", len(tasks))
+
+        # Rows come straight from typed columns, validating them again would double the cost
+        return schemas.TaskPage.model_construct(
+            items=tasks,
+            next_cursor=next_cursor,
+            next_cursor_value=next_cursor_value,
+            fields=fields,
+            version=version,
+        )
+
+    async def get_tasks_page_version(
+            self,
+            limit: int,
+            after: typing.Optional[int] = None,
+            filters: typing.Optional[schemas.TaskListFilter] = None,
+            after_value: typing.Optional[str] = None,
+            fields: typing.Optional[typing.Tuple[str, ...]] = None,
+    ) -> str:
+        filters = self._resolve_filters(filters)
+        cursor_value = self._cursor_value(filters.sort, after, after_value)
+        count, last_updated_at, id_sum = await self._coalesce(
+            ("page_version", limit, after, filters.model_dump_json(), cursor_value),
+            lambda: self.task_repository.get_page_fingerprint(limit + 1, after, filters, cursor_value),
+        )
+        return self._page_version(limit, after, filters, cursor_value, fields, count, last_updated_at, id_sum)
+
+    @staticmethod
+    def parse_fields(fields: typing.Optional[str]) -> typing.Optional[typing.Tuple[str, ...]]:
+        if fields is None:
+            return None
+
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(TASK_FIELDS)
+        if unknown or not requested:
+            problem = f"Unknown fields: {', '.join(sorted(unknown))}" if unknown else "No fields requested"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{problem}. Available fields: {', '.join(TASK_FIELDS)}"
+            )
+
+        # Canonical order keeps output and validators identical for the same set of fields
+        if len(requested) == len(TASK_FIELDS):
+            return None
+        return tuple(field for field in TASK_FIELDS if field in requested)
+
+    @staticmethod
+    def _with_fields(
+            fields: typing.Optional[typing.Tuple[str, ...]],
+            *required: str,
+    ) -> typing.Optional[typing.Tuple[str, ...]]:
+        if fields is None:
+            return None
+        selected = set(fields).union(required)
+        return tuple(field for field in TASK_FIELDS if field in selected)
+
+    @staticmethod
+    def _resolve_filters(filters: typing.Optional[schemas.TaskListFilter]) -> schemas.TaskListFilter:
+        filters = filters or schemas.TaskListFilter()
+        ranges = filters.ranges()
+        sort = filters.sort
+        if sort is None:
+            sort = schemas.TaskSort(next(iter(ranges))) if len(ranges) == 1 else schemas.TaskSort.ID
+
+        # A range on another column would force a scan of the sort index or a temporary sort
+        unsupported = [field for field in ranges if field != sort.field]
+        if unsupported:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Range filters are only supported on the sort field ({sort.field}), got: {', '.join(unsupported)}"
+            )
+
+        return filters.model_copy(update={"sort": sort})
+
+    @staticmethod
+    def _cursor_value(
+            sort: schemas.TaskSort,
+            after: typing.Optional[int],
+            after_value: typing.Optional[str],
+    ) -> typing.Any:
+        if sort.field == "id" or after is None:
+            return None
+        if after_value is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"after_value is required to paginate by {sort.field}"
+            )
+        if sort.field == "title":
+            return after_value
+
+        try:
+            value = datetime.fromisoformat(after_value)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"after_value must be an ISO 8601 timestamp to paginate by {sort.field}"
+            )
+        return schemas.TaskListFilter.to_storage_timezone(value)
+
+    @staticmethod
+    def _page_version(
+            limit: int,
+            after: typing.Optional[int],
+            filters: schemas.TaskListFilter,
+            after_value: typing.Any,
+            fields: typing.Optional[typing.Tuple[str, ...]],
+            count: int,
+            last_updated_at: typing.Optional[datetime],
+            id_sum: typing.Optional[int],
+    ) -> str:
+        # The id sum changes when rows leave or enter the page window without touching updated_at
+        last_updated = last_updated_at.isoformat() if last_updated_at else ""
+        query = filters.model_dump_json(exclude_none=True)
+        selected = ",".join(fields) if fields else ""
+        return f"{limit}:{after}:{after_value}:{query}:{selected}:{count}:{last_updated}:{id_sum or 0}"
+
+    async def export_tasks(self) -> typing.AsyncIterator[typing.List[typing.Dict[str, typing.Any]]]:
+        logger.info("Exporting all tasks")
+        exported = 0
+        async for tasks in self.task_repository.stream_all():
+            exported += len(tasks)
+            yield tasks
+        logger.info("Exported %s tasks", exported)
+
+    async def search_tasks(
+            self,
+            query: str,
+            limit: int,
+            offset: int = 0,
+            snippets: bool = False,
+    ) -> schemas.TaskSearchPage:
+        logger.info("Searching tasks: query=%r, limit=%s, offset=%s", query, limit, offset)
+        match = self._match_expression(query)
+        if not match:
+            return schemas.TaskSearchPage(items=[])
+
+        return await self._coalesce(
+            ("search", match, limit, offset, snippets),
+            lambda: self._load_search_page(match, limit, offset, snippets),
+        )
+
+    async def _load_search_page(self, match: str, limit: int, offset: int, snippets: bool) -> schemas.TaskSearchPage:
+        hits = await self.task_repository.search(match, limit + 1, offset, snippets)
+        next_offset = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            # No link past TASKS_SEARCH_MAX_OFFSET, the controller rejects deeper pages
+            if offset + limit <= settings.TASKS_SEARCH_MAX_OFFSET:
+                next_offset = offset + limit
+        logger.info("Found %s tasks", len(hits))
+
+        return schemas.TaskSearchPage(
+            items=[DTOMapper.search_hit_to_result(task, snippet) for task, snippet in hits],
+            next_offset=next_offset,
+        )
+
+    async def get_changes(self, since: typing.Optional[str], limit: int) -> schemas.TaskChanges:
+        logger.info("Fetching task changes: since=%s, limit=%s", since, limit)
+        # Every shard numbers its changes on its own, a token holds one position per shard
+        shards = self.task_repository.shards
+        since_seqs = self._parse_sync_token(since, len(shards))
+        # Only sequence numbers up to the current one are read: they are all committed,
+        # so a later sync can't find a change below next_token
+        states = await asyncio.gather(*(shard.get_sync_state() for shard in shards))
+        if since is not None and any(seq < compacted for seq, (_, compacted) in zip(since_seqs, states)):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Sync token is older than the retained deletions, download the full list and sync again"
+            )
+
+        # A first sync has no deletions to learn about
+        results = await asyncio.gather(*(
+            shard.get_changes(seq, until, limit + 1, since is not None)
+            for shard, seq, (until, _) in zip(shards, since_seqs, states)
+        ))
+        changes = []
+        for shard, (changed, deleted) in enumerate(results):
+            changes.extend((task["change_seq"], shard, task) for task in changed)
+            changes.extend((seq, shard, task_id) for task_id, seq in deleted)
+        changes.sort(key=lambda change: change[:2])
+
+        # A shard with changes left over continues after its last returned change
+        has_more = len(changes) > limit
+        truncated = {shard for _, shard, _ in changes[limit:]}
+        changes = changes[:limit]
+        positions = [since_seqs[shard] if shard in truncated else until for shard, (until, _) in enumerate(states)]
+        for seq, shard, _ in changes:
+            if shard in truncated:
+                positions[shard] = seq
+        logger.info("Found %s task changes", len(changes))
+
+        return schemas.TaskChanges(
+            items=[change for _, _, change in changes if isinstance(change, dict)],
+            deleted=[change for _, _, change in changes if isinstance(change, int)],
+            next_token=".".join(map(str, positions)),
+            has_more=has_more,
+        )
+
+    @staticmethod
+    def _parse_sync_token(since: typing.Optional[str], shards: int) -> typing.List[int]:
+        if since is None:
+            return [0] * shards
+        positions = since.split(".")
+        if len(positions) > shards or not all(position.isdigit() for position in positions):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid sync token: {since}"
+            )
+        # Shards added after the token was issued are read from the start
+        return [int(position) for position in positions] + [0] * (shards - len(positions))
 
-    async def get_all_tasks(self) -> typing.List[schemas.TaskResponse]:
-        logger.info("Fetching all tasks")
-        tasks = await self.task_repository.get_all()
-        logger.info(f"Retrieved {len(tasks)} tasks")
+    async def compact_tombstones(self, retention_days: int) -> int:
+        # Tombstones keep SQLite's own UTC timestamps
+        deleted_before = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+        removed = await self.task_repository.compact_tombstones(deleted_before)
+        logger.info("Compacted %s task tombstones deleted before %s UTC", removed, deleted_before)
+        return removed
 
-        return DTOMapper.tasks_to_responses(tasks)
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        # Every term becomes a quoted FTS5 string, so user input can't inject query syntax.
+        # A trailing "*" is kept as a prefix search
+        terms = []
+        for term in query.split():
+            prefix = term.endswith("*")
+            term = term.rstrip("*")
+            if term:
+                quoted = '"' + term.replace('"', '""') + '"'
+                terms.append(quoted + "*" if prefix else quoted)
+        return " ".join(terms)
 
     async def get_task_by_id(self, task_id: int) -> schemas.TaskResponse:
-        logger.info(f"Fetching task with ID {task_id}")
+        logger.info("Fetching task with ID %s", task_id)
+        generation = None
+        if self.cache is not None:
+            cached = self.cache.get(task_id)
+            if cached is not None:
+                logger.info("Retrieved task with ID %s from cache", task_id)
+                return cached
+            generation = self.cache.generation
+
+        return await self._coalesce(("task", task_id), lambda: self._load_task(task_id, generation))
+
+    async def _load_task(self, task_id: int, generation: typing.Optional[int]) -> schemas.TaskResponse:
         task = await self.task_repository.get_by_id(task_id)
 
         if not task:
-            logger.warning(f"Task with ID {task_id} not found")
+            logger.warning("Task with ID %s not found", task_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Task with ID {task_id} not found"
+            )
+        logger.info("Retrieved task with ID %s", task_id)
+
+        response = DTOMapper.task_to_response(task)
+        if self.cache is not None:
+            self.cache.set(task_id, response, generation)
+
+        return response
+
+    async def get_task_fields(self, task_id: int, fields: typing.Tuple[str, ...]) -> typing.Dict[str, typing.Any]:
+        logger.info("Fetching fields %s of task with ID %s", fields, task_id)
+        # Validators need id and updated_at even when the client didn't ask for them
+        columns = self._with_fields(fields, "id", "updated_at")
+        if self.cache is not None:
+            cached = self.cache.get(task_id)
+            if cached is not None:
+                return cached.model_dump(include=set(columns))
+
+        task = await self._coalesce(
+            ("task_fields", task_id, columns),
+            lambda: self.task_repository.get_fields_by_id(task_id, columns),
+        )
+        if task is None:
+            logger.warning("Task with ID %s not found", task_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Task with ID {task_id} not found"
             )
-        logger.info(f"Retrieved task with ID {task_id}")
 
-        return DTOMapper.task_to_response(task) #task_data.model_dump()
+        return task
+
+    async def get_task_updated_at(self, task_id: int) -> datetime:
+        if self.cache is not None:
+            cached = self.cache.get(task_id)
+            if cached is not None:
+                return cached.updated_at
+
+        updated_at = await self._coalesce(
+            ("updated_at", task_id),
+            lambda: self.task_repository.get_updated_at(task_id),
+        )
+        if updated_at is None:
+            logger.warning("Task with ID %s not found", task_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Task with ID {task_id} not found"
+            )
+
+        return updated_at
 
     async def create_task(self, task_data: schemas.TaskCreate) -> schemas.TaskResponse:
-        logger.info(f"Creating new task: {task_data.title}")
+        logger.info("Creating new task: %s", task_data.title)
         task_dict = DTOMapper.create_dto_to_dict(task_data)
         task = await self.task_repository.create(task_dict)
-        logger.info(f"Created new task with ID {task.id}")
+        self._invalidate(task.id)
+        logger.info("Created new task with ID %s", task.id)
 
-        return DTOMapper.task_to_response(task)
+        response = DTOMapper.task_to_response(task)
+        self._publish("created", response)
+        return response
 
-    async def update_task(self, task_id: int, task_data: schemas.TaskUpdate) -> schemas.TaskResponse:
-        logger.info(f"Updating task with ID {task_id}")
+    async def create_tasks(self, tasks_data: typing.List[schemas.TaskCreate]) -> typing.List[int]:
+        logger.info("Creating %s tasks in bulk", len(tasks_data))
+        tasks = [DTOMapper.create_dto_to_dict(task_data) for task_data in tasks_data]
+        ids = await self.task_repository.create_many(tasks)
+        self._invalidate(*ids)
+        self._publish("created", *ids)
+        logger.info("Created %s tasks in bulk", len(ids))
 
-        await self.get_task_by_id(task_id)
+        return ids
+
+    async def update_task(self, task_id: int, task_data: schemas.TaskUpdate) -> schemas.TaskResponse:
+        logger.info("Updating task with ID %s", task_id)
 
         task_dict = DTOMapper.update_dto_to_dict(task_data)
         updated_task = await self.task_repository.update(task_id, task_dict)
+        self._invalidate(task_id)
 
         if not updated_task:
-            logger.warning(f"Task with ID {task_id} not found during update")
+            logger.warning("Task with ID %s not found", task_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Task with ID {task_id} not found"
             )
-        logger.info(f"Updated task with ID {task_id}")
+        logger.info("Updated task with ID %s", task_id)
 
-        return DTOMapper.task_to_response(updated_task)
+        response = DTOMapper.task_to_response(updated_task)
+        self._publish("updated", response)
+        return response
 
-    async def delete_task(self, task_id: int) -> None:
-        logger.info(f"Deleting task with ID {task_id}")
+    async def update_tasks(self, tasks_data: typing.List[schemas.TaskBulkUpdateItem]) -> schemas.TaskBulkResult:
+        logger.info("Updating %s tasks in bulk", len(tasks_data))
+        patches = {task_data.id: DTOMapper.bulk_update_dto_to_dict(task_data) for task_data in tasks_data}
+        updated = await self.task_repository.update_many(patches)
+        self._invalidate(*updated)
+        self._publish("updated", *updated)
+        logger.info("Updated %s tasks in bulk", len(updated))
+
+        return self._bulk_result(list(patches), updated)
+
+    async def delete_tasks(self, task_ids: typing.List[int]) -> schemas.TaskBulkResult:
+        logger.info("Deleting %s tasks in bulk", len(task_ids))
+        task_ids = list(dict.fromkeys(task_ids))
+        deleted = await self.task_repository.delete_many(task_ids)
+        self._invalidate(*deleted)
+        self._publish("deleted", *deleted)
+        logger.info("Deleted %s tasks in bulk", len(deleted))
+
+        return self._bulk_result(task_ids, deleted)
+
+    def _invalidate(self, *task_ids: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(*task_ids)
+        if self.flights is not None:
+            changed = set(task_ids)
+            # Reads still in flight may have seen the old rows, later callers must not join them
+            self.flights.forget(lambda key: key[0] not in _TASK_KEYS or key[1] in changed)
 
-        await self.get_task_by_id(task_id)
+    def _publish(self, event_type: str, *tasks: typing.Union[int, schemas.TaskResponse]) -> None:
+        # Called after the commit. Single-task writes carry the whole task, bulk writes only the ids
+        if self.events is None:
+            return
+        for task in tasks:
+            if isinstance(task, int):
+                self.events.publish(event_type, b'{"id":%d}' % task)
+            else:
+                self.events.publish(event_type, task.model_dump_json().encode())
 
-        await self.task_repository.delete(task_id)
+    def stream_changes(self, since: typing.Optional[str] = None) -> typing.AsyncIterator[bytes]:
+        if self.events is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Change feed is disabled"
+            )
+        if self.events.full:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many change feed subscribers",
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+            )
+        if since is not None:
+            try:
+                self.events.parse_position(since)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid change feed position: {since}"
+                )
+        return sse_stream(self.events, since, settings.CHANGE_FEED_HEARTBEAT)
 
-        logger.info(f"Deleted task with ID {task_id}")
\ No newline at end of file
+    @staticmethod
+    def _bulk_result(requested: typing.List[int], affected: typing.List[int]) -> schemas.TaskBulkResult:
+        affected_ids = set(affected)
+        missing = [task_id for task_id in requested if task_id not in affected_ids]
+        if missing:
+            logger.warning("Tasks not found during bulk operation: %s", missing)
+
+        return schemas.TaskBulkResult(
+            ids=[task_id for task_id in requested if task_id in affected_ids],
+            missing=missing,
+        )
+
+    async def delete_task(self, task_id: int) -> None:
+        logger.info("Deleting task with ID %s", task_id)
+
+        deleted = await self.task_repository.delete(task_id)
+        self._invalidate(task_id)
+
+        if not deleted:
+            logger.warning("Task with ID %s not found", task_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Task with ID {task_id} not found"
+            )
+        self._publish("deleted", task_id)
+        logger.info("Deleted task with ID %s", task_id)
\ No newline at end of file
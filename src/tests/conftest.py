@@ -61,6 +61,20 @@ def task_samples():
     ]
 
 
+@pytest.fixture
+def task_row_samples(task_samples):
+    return [
+        {
+            "title": task.title,
+            "description": task.description,
+            "id": task.id,
+            "created_at": task.created_at,
+            "updated_at": task.updated_at,
+        }
+        for task in task_samples
+    ]
+
+
 @pytest.fixture
 def task_response_sample():
     now = datetime.now(settings.TIMEZONE)
@@ -118,8 +132,8 @@ def mock_db_session():
 @pytest.fixture
 def mock_task_repository(task_sample, task_samples):
     repository_mock = AsyncMock(spec=TaskRepository)
+    repository_mock.shards = [repository_mock]
 
-    repository_mock.get_all.return_value = task_samples
     repository_mock.get_by_id.side_effect = lambda task_id: (
         next((t for t in task_samples if t.id == task_id), None)
     )
@@ -127,16 +141,15 @@ def mock_task_repository(task_sample, task_samples):
     repository_mock.update.side_effect = lambda task_id, task_data: (
         task_sample if task_id == 1 else None
     )
-    repository_mock.delete.return_value = None
+    repository_mock.delete.side_effect = lambda task_id: task_id == 1
 
     return repository_mock
 
 
 @pytest.fixture
-def mock_task_service(task_response_sample, task_response_samples):
+def mock_task_service(task_response_sample):
     service_mock = AsyncMock(spec=TaskService)
 
-    service_mock.get_all_tasks.return_value = task_response_samples
     service_mock.get_task_by_id.side_effect = lambda task_id: (
         task_response_sample if task_id == 1 else (_ for _ in ()).throw(Exception("Task not found"))
     )
@@ -0,0 +1,182 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from main import create_app
+from src.app.core import admission
+from src.app.core.admission import AdmissionMiddleware, Limiter
+
+
+@pytest.mark.asyncio
+async def test_limiter_hands_slots_to_waiters_in_order():
+    limiter = Limiter(limit=1, queue_size=2, timeout=1)
+    order = []
+
+    async def request(name):
+        assert await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    assert await limiter.acquire()
+    waiters = [asyncio.create_task(request(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 2
+
+    limiter.release()
+    await asyncio.gather(*waiters)
+
+    assert order == ["first", "second"]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_is_full_or_wait_times_out():
+    limiter = Limiter(limit=1, queue_size=1, timeout=0.01)
+    assert await limiter.acquire()
+
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert await limiter.acquire() is False
+    assert await limiter.acquire(wait=False) is False
+    assert await queued is False
+
+    assert (limiter.rejected, limiter.timed_out, limiter.waiting, limiter.active) == (2, 1, 0, 1)
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_retry_after_and_keeps_budgets_separate():
+    app = FastAPI()
+    release = asyncio.Event()
+    write = Limiter(limit=1, queue_size=0, timeout=1)
+    app.add_middleware(
+        AdmissionMiddleware,
+        read=Limiter(limit=1, queue_size=0, timeout=1),
+        write=write,
+        retry_after=3,
+    )
+
+    @app.post("/tasks")
+    async def create():
+        await release.wait()
+        return {}
+
+    @app.get("/tasks/{task_id}")
+    async def get(task_id: int):
+        return {"id": task_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        pending = asyncio.create_task(client.post("/tasks"))
+        while write.active == 0:
+            await asyncio.sleep(0)
+
+        shed = await client.post("/tasks")
+        read = await client.get("/tasks/1")
+        release.set()
+        created = await pending
+
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "3"
+    assert read.status_code == 200
+    assert created.status_code == 200
+    assert write.active == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_applies_route_limits_and_pool_saturation():
+    app = FastAPI()
+    saturated = {"write": False}
+    app.add_middleware(
+        AdmissionMiddleware,
+        read=Limiter(limit=10, queue_size=10, timeout=1),
+        write=Limiter(limit=0, queue_size=10, timeout=1),
+        routes={"/tasks/export": Limiter(limit=0, queue_size=0, timeout=1)},
+        saturated=lambda write, waiting: saturated["write"] and write,
+        exempt=("/",),
+    )
+
+    @app.get("/")
+    async def health():
+        return {}
+
+    @app.get("/tasks/export")
+    async def export():
+        return []
+
+    @app.delete("/tasks/{task_id}")
+    async def delete(task_id: int):
+        return {}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/tasks/export")).status_code == 503
+        assert (await client.get("/")).status_code == 200
+
+        saturated["write"] = True
+        # A saturated pool sheds immediately instead of queueing until the timeout
+        assert (await asyncio.wait_for(client.delete("/tasks/1"), 0.5)).status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_requests_over_the_limit_queue_until_a_slot_frees_or_they_time_out():
+    app = FastAPI()
+    gate = {"open": asyncio.Event()}
+    write = Limiter(limit=1, queue_size=5, timeout=0.2)
+    app.add_middleware(
+        AdmissionMiddleware,
+        read=Limiter(limit=1, queue_size=0, timeout=1),
+        write=write,
+        # An exhausted pool of two connections: two queued requests already take both
+        saturated=lambda is_write, waiting: waiting >= 2,
+    )
+
+    @app.put("/tasks/{task_id}")
+    async def update(task_id: int):
+        await gate["open"].wait()
+        return {"id": task_id}
+
+    async def queued(count):
+        while write.waiting < count:
+            await asyncio.sleep(0)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        running = asyncio.create_task(client.put("/tasks/1"))
+        while write.active == 0:
+            await asyncio.sleep(0)
+        waiting = [asyncio.create_task(client.put(f"/tasks/{task_id}")) for task_id in (2, 3)]
+        await queued(2)
+        shed = await asyncio.wait_for(client.put("/tasks/4"), 0.1)
+
+        gate["open"].set()
+        responses = [await running, *[await request for request in waiting]]
+
+        gate["open"] = asyncio.Event()
+        blocking = asyncio.create_task(client.put("/tasks/5"))
+        while write.active == 0:
+            await asyncio.sleep(0)
+        started = asyncio.get_running_loop().time()
+        timed_out = await client.put("/tasks/6")
+        waited = asyncio.get_running_loop().time() - started
+        gate["open"].set()
+        await blocking
+
+    assert shed.status_code == 503
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert timed_out.status_code == 503
+    assert waited >= 0.2
+    assert (write.rejected, write.timed_out, write.active) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_shed_response_carries_cors_headers():
+    with patch.object(admission, "route_limiters", {"/tasks/export": Limiter(limit=0, queue_size=0, timeout=1)}):
+        app = create_app()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        shed = await client.get("/tasks/export", headers={"Origin": "http://example.com"})
+
+    assert shed.status_code == 503
+    assert shed.headers["access-control-allow-origin"] == "http://example.com"
+    assert "Retry-After" in shed.headers["access-control-expose-headers"]
@@ -0,0 +1,57 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.app.core.batching import WriteCoalescer
+
+
+def make_session_factory():
+    sessions = []
+
+    def factory():
+        session = MagicMock()
+        session.commit = AsyncMock()
+        session.__aenter__ = AsyncMock(return_value=session)
+        session.__aexit__ = AsyncMock(return_value=False)
+        sessions.append(session)
+        return session
+
+    return factory, sessions
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_commit():
+    factory, sessions = make_session_factory()
+    coalescer = WriteCoalescer(factory, window=0.01, max_batch_size=10)
+
+    async def write(value):
+        return await coalescer.submit(lambda session: asyncio.sleep(0, result=value))
+
+    results = await asyncio.gather(*(write(i) for i in range(5)))
+    await coalescer.close()
+
+    assert results == [0, 1, 2, 3, 4]
+    assert len(sessions) == 1
+    sessions[0].commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_one_by_one():
+    factory, sessions = make_session_factory()
+    coalescer = WriteCoalescer(factory, window=0.01, max_batch_size=10)
+
+    async def failing(session):
+        raise ValueError("broken write")
+
+    results = await asyncio.gather(
+        coalescer.submit(lambda session: asyncio.sleep(0, result="ok")),
+        coalescer.submit(failing),
+        return_exceptions=True,
+    )
+    await coalescer.close()
+
+    assert results[0] == "ok"
+    assert isinstance(results[1], ValueError)
+    # the failed batch plus one session per retried operation
+    assert len(sessions) == 3
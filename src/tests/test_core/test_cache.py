@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from src.app.core.cache import LRUCache
+
+
+def test_get_miss_and_hit():
+    cache = LRUCache(max_size=2, ttl=30)
+
+    assert cache.get(1) is None
+    cache.set(1, "task 1")
+
+    assert cache.get(1) == "task 1"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=30)
+    cache.set(1, "task 1")
+    cache.set(2, "task 2")
+    cache.get(1)
+
+    cache.set(3, "task 3")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "task 1"
+    assert cache.get(3) == "task 3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = LRUCache(max_size=2, ttl=30)
+
+    with patch('src.app.core.cache.time.monotonic', return_value=100.0):
+        cache.set(1, "task 1")
+    with patch('src.app.core.cache.time.monotonic', return_value=131.0):
+        assert cache.get(1) is None
+
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidate_discards_stale_load():
+    cache = LRUCache(max_size=2, ttl=30)
+    cache.set(1, "task 1")
+    generation = cache.generation
+
+    cache.invalidate(1)
+    cache.set(1, "stale task 1", generation)
+
+    assert cache.get(1) is None
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import select, update
+
+from src.app.core import database
+from src.app.core.database import (
+    _sqlite_pragmas, create_engine_from_settings, routing_session, shard_url, warm_up_engine,
+)
+from src.app.task.models import Task
+
+
+def test_sqlite_pragmas():
+    assert "PRAGMA query_only = ON" not in _sqlite_pragmas(read_only=False)
+    assert "PRAGMA query_only = ON" in _sqlite_pragmas(read_only=True)
+
+
+def test_routing_session():
+    writer, reader = MagicMock(), MagicMock()
+    session = routing_session(writer, reader)()
+
+    assert session.get_bind(clause=select(Task)) is reader.sync_engine
+    assert session.get_bind(clause=update(Task)) is writer.sync_engine
+    # Reads after a write stay on the writer until the transaction ends
+    assert session.get_bind(clause=select(Task)) is writer.sync_engine
+
+
+@pytest.mark.asyncio
+async def test_warm_up_engine(tmp_path):
+    with patch.object(database.settings, "METRICS_ENABLED", False):
+        async_engine = create_engine_from_settings(f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}")
+    pool = async_engine.sync_engine.pool
+
+    try:
+        assert await warm_up_engine(async_engine) == pool.size()
+        assert pool.checkedin() == pool.size()
+        assert pool.checkedout() == 0
+    finally:
+        await async_engine.dispose()
+
+
+def test_shard_url():
+    assert shard_url("sqlite+aiosqlite:///./tasks.db", 0) == "sqlite+aiosqlite:///./tasks.db"
+    assert shard_url("sqlite+aiosqlite:///./tasks.db", 2) == "sqlite+aiosqlite:///./tasks-shard2.db"
+    assert shard_url("sqlite+aiosqlite://", 2) == "sqlite+aiosqlite://"
@@ -0,0 +1,106 @@
+import gzip
+import json
+from datetime import datetime
+
+import msgpack
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from src.app.core.encoders import encoders, negotiate_coding, render_response, stream_response
+
+ROWS = [
+    {"title": f"Task {i}", "description": "Description", "id": i,
+     "created_at": datetime(2025, 3, 2, 12, 0), "updated_at": datetime(2025, 3, 2, 12, 0)}
+    for i in range(1, 4)
+]
+
+
+def make_request(**headers: str) -> Request:
+    raw_headers = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+async def batches():
+    yield ROWS[:2]
+    yield []
+    yield ROWS[2:]
+
+
+def test_negotiate_prefers_specific_match():
+    request = make_request(accept="application/json;q=0.9, application/msgpack, */*;q=0.1")
+
+    assert encoders.negotiate(request).media_type == "application/msgpack"
+
+
+def test_negotiate_wildcard_uses_default():
+    assert encoders.negotiate(make_request(accept="*/*")).media_type == "application/json"
+    assert encoders.negotiate(make_request(), default="text/csv").media_type == "text/csv"
+
+
+def test_negotiate_not_acceptable():
+    with pytest.raises(HTTPException) as excinfo:
+        encoders.negotiate(make_request(accept="application/xml, application/json;q=0"))
+
+    assert excinfo.value.status_code == 406
+
+
+def test_negotiate_coding():
+    assert negotiate_coding(make_request(accept_encoding="gzip, deflate")) == "gzip"
+    assert negotiate_coding(make_request(accept_encoding="gzip, zstd")) == "zstd"
+    assert negotiate_coding(make_request(accept_encoding="zstd;q=0, *")) == "gzip"
+    assert negotiate_coding(make_request(accept_encoding="identity")) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("media_type", ["application/json", "text/csv", "application/x-ndjson"])
+async def test_stream_matches_document(media_type):
+    encoder = encoders.encoders[media_type]
+
+    chunks = [chunk async for chunk in encoder.stream(batches(), ("id", "title"))]
+
+    assert b"".join(chunks) == encoder.document(ROWS, ("id", "title"))
+
+
+def test_encoders_project_fields():
+    fields = ("id", "updated_at")
+
+    assert json.loads(encoders.encoders["application/json"].document(ROWS, fields))[0] == {
+        "id": 1, "updated_at": "2025-03-02T12:00:00",
+    }
+    assert msgpack.unpackb(encoders.encoders["application/msgpack"].item(ROWS[0], fields)) == {
+        "id": 1, "updated_at": "2025-03-02T12:00:00",
+    }
+    assert encoders.encoders["text/csv"].document(ROWS[:1], fields) == b"id,updated_at\r\n1,2025-03-02T12:00:00\r\n"
+
+
+def test_render_response_compresses_large_bodies():
+    encoder = encoders.encoders["application/json"]
+    body = encoder.document(ROWS * 50)
+
+    response = render_response(make_request(accept_encoding="gzip"), encoder, body)
+    small = render_response(make_request(accept_encoding="gzip"), encoder, encoder.item(ROWS[0]))
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == body
+    assert "content-encoding" not in small.headers
+
+
+@pytest.mark.asyncio
+async def test_stream_response_fails_before_headers():
+    async def failing_batches():
+        raise RuntimeError("database is locked")
+        yield ROWS
+
+    with pytest.raises(RuntimeError):
+        await stream_response(make_request(), encoders.encoders["application/json"], failing_batches())
+
+
+@pytest.mark.asyncio
+async def test_stream_response_compressed():
+    response = await stream_response(make_request(accept_encoding="gzip"), encoders.encoders["text/csv"], batches())
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body).count(b"\r\n") == 4
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src.app.core.events import EventBroker, sse_stream
+
+
+@pytest.mark.asyncio
+async def test_subscriber_receives_published_events():
+    broker = EventBroker(buffer_size=10, history_size=10, max_subscribers=10)
+    subscription = broker.subscribe()
+
+    broker.publish("created", b'{"id":1}')
+    event = await subscription.next(timeout=1)
+
+    assert event.sequence == 1
+    assert event.frame == b'id: %s-1\nevent: created\ndata: {"id":1}\n\n' % broker.epoch.encode()
+    assert await subscription.next(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_missed_events():
+    broker = EventBroker(buffer_size=10, history_size=10, max_subscribers=10)
+    for task_id in range(1, 4):
+        broker.publish("created", b'{"id":%d}' % task_id)
+
+    subscription = broker.subscribe(since=broker.position(1))
+    broker.publish("deleted", b'{"id":1}')
+
+    sequences = [(await subscription.next(timeout=1)).sequence for _ in range(3)]
+    assert sequences == [2, 3, 4]
+    assert not subscription.reset
+
+
+def test_resume_from_unknown_position_resets():
+    broker = EventBroker(buffer_size=10, history_size=2, max_subscribers=10)
+    for task_id in range(1, 5):
+        broker.publish("created", b'{"id":%d}' % task_id)
+
+    assert broker.subscribe(since=broker.position(1)).reset
+    assert broker.subscribe(since="0000-3").reset
+    assert not broker.subscribe(since=broker.position(2)).reset
+    with pytest.raises(ValueError):
+        broker.subscribe(since="latest")
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected():
+    broker = EventBroker(buffer_size=2, history_size=10, max_subscribers=10)
+    stream = sse_stream(broker, None, heartbeat=1)
+    first = asyncio.create_task(stream.__anext__())
+    await asyncio.sleep(0)
+
+    for task_id in range(1, 4):
+        broker.publish("created", b'{"id":%d}' % task_id)
+
+    frames = [await first] + [frame async for frame in stream]
+
+    assert len(frames) == 3
+    assert frames[-1] == b"event: overflow\ndata: {}\n\n"
+    assert broker.stats()["subscribers"] == 0
+    assert broker.disconnected == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_heartbeats_and_ends_on_close():
+    broker = EventBroker(buffer_size=2, history_size=10, max_subscribers=10)
+    stream = sse_stream(broker, None, heartbeat=0.01)
+
+    assert await stream.__anext__() == b": ping\n\n"
+    broker.close()
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_stream_subscribes_only_while_it_runs():
+    broker = EventBroker(buffer_size=2, history_size=10, max_subscribers=10)
+    broker.publish("created", b'{"id":1}')
+    stream = sse_stream(broker, broker.position(0), heartbeat=1)
+
+    assert broker.stats()["subscribers"] == 0
+    assert (await stream.__anext__()).startswith(b"id: %s-1\n" % broker.epoch.encode())
+    assert broker.stats()["subscribers"] == 1
+    await stream.aclose()
+    assert broker.stats()["subscribers"] == 0
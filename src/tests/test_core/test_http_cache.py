@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.requests import Request
+
+from main import create_app
+from src.app.core import http_cache
+from src.app.dependencies import get_task_service
+
+
+def make_request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/tasks/1",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_if_none_match():
+    etag = http_cache.make_etag(1, "2025-03-02T12:00:00")
+
+    assert http_cache.is_not_modified(make_request({"If-None-Match": etag}), etag)
+    assert http_cache.is_not_modified(make_request({"If-None-Match": f'"other", W/{etag}'}), etag)
+    assert not http_cache.is_not_modified(make_request({"If-None-Match": '"other"'}), etag)
+
+
+def test_if_modified_since():
+    etag = http_cache.make_etag(1)
+    # 12:00:30 in Europe/Moscow is 09:00:30 GMT
+    last_modified = datetime(2025, 3, 2, 12, 0, 30, 500000)
+
+    assert http_cache.http_date(last_modified) == "Sun, 02 Mar 2025 09:00:30 GMT"
+    assert http_cache.is_not_modified(
+        make_request({"If-Modified-Since": "Sun, 02 Mar 2025 09:00:30 GMT"}), etag, last_modified
+    )
+    assert not http_cache.is_not_modified(
+        make_request({"If-Modified-Since": "Sun, 02 Mar 2025 09:00:29 GMT"}), etag, last_modified
+    )
+    assert not http_cache.is_not_modified(make_request({"If-Modified-Since": "garbage"}), etag, last_modified)
+
+
+def test_if_none_match_takes_precedence():
+    etag = http_cache.make_etag(1)
+    request = make_request({
+        "If-None-Match": '"other"',
+        "If-Modified-Since": "Sun, 02 Mar 2025 09:00:30 GMT",
+    })
+
+    assert not http_cache.is_not_modified(request, etag, datetime(2025, 3, 2, 12, 0, 0))
+
+
+@pytest.mark.asyncio
+async def test_not_modified_carries_the_headers_of_the_full_response(mock_task_service, task_response_sample):
+    app = create_app()
+    app.dependency_overrides[get_task_service] = lambda: mock_task_service
+    mock_task_service.parse_fields.return_value = None
+    mock_task_service.get_task_updated_at.return_value = task_response_sample.updated_at
+    headers = {"Origin": "http://example.com", "Accept-Encoding": "gzip"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        full = await client.get("/tasks/1", headers=headers)
+        cached = await client.get("/tasks/1", headers={**headers, "If-None-Match": full.headers["ETag"]})
+
+    assert full.status_code == 200
+    assert cached.status_code == 304
+    assert cached.headers["Vary"] == full.headers["Vary"] == "Accept, Accept-Encoding, Origin"
+    assert cached.headers["ETag"] == full.headers["ETag"]
+    assert cached.headers["Last-Modified"] == full.headers["Last-Modified"]
@@ -0,0 +1,60 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+from src.app.core.logging import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, SamplingFilter
+
+
+def make_record(level=logging.INFO, msg="Fetching task with ID %s", args=(1,), name="task_manager.service", **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record(duration=0.5)))
+
+    assert entry["message"] == "Fetching task with ID 1"
+    assert entry["logger"] == "task_manager.service"
+    assert entry["duration"] == 0.5
+
+
+def test_queue_handler_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+    handler.emit(make_record())
+    handler.emit(make_record())
+
+    assert handler.enqueued == 1
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "Fetching task with ID 1"
+
+
+def test_sampling_filter_keeps_errors():
+    sampling = SamplingFilter(rate=0.0)
+
+    assert not sampling.filter(make_record())
+    assert sampling.filter(make_record(level=logging.ERROR))
+
+
+def test_filters_on_the_handler_match_child_loggers():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.addFilter(SamplingFilter(rate=0.0, name="task_manager"))
+
+    handler.handle(make_record(name="task_manager.http"))
+    handler.handle(make_record(name="fastapi"))
+
+    assert [record.name for record in list(handler.queue.queue)] == ["fastapi"]
+
+
+def test_rate_limit_filter():
+    with patch('src.app.core.logging.time.monotonic', return_value=100.0):
+        rate_limit = RateLimitFilter(per_second=2)
+        results = [rate_limit.filter(make_record()) for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert rate_limit.suppressed == 1
+
+    with patch('src.app.core.logging.time.monotonic', return_value=101.0):
+        assert rate_limit.filter(make_record())
@@ -0,0 +1,52 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from src.app.core.metrics import Histogram, MetricsMiddleware, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    lines = list(histogram.render("latency", 'route="/"'))
+
+    assert lines == [
+        'latency_bucket{route="/",le="0.1"} 1',
+        'latency_bucket{route="/",le="1.0"} 2',
+        'latency_bucket{route="/",le="+Inf"} 3',
+        'latency_sum{route="/"} 5.55',
+        'latency_count{route="/"} 3',
+    ]
+
+
+def test_statement_kind_from_sql():
+    registry = MetricsRegistry()
+
+    registry.observe_statement("SELECT tasks.id FROM tasks", 0.001)
+    registry.observe_statement("  insert INTO tasks VALUES (?)", 0.002)
+
+    assert set(registry.statements) == {"SELECT", "INSERT"}
+    assert 'db_statement_duration_seconds_count{statement="SELECT"} 1' in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    registry = MetricsRegistry()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/missing")
+
+    assert registry.requests["/items/{item_id}"]["GET"][200].count == 2
+    assert registry.requests["unmatched"]["GET"][404].count == 1
+    assert registry.requests_in_flight == 0
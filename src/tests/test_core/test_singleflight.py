@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from src.app.core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(flights.do("task", load) for _ in range(10)))
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"in_flight": 0, "calls": 1, "shared": 9}
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("database is locked")
+
+    results = await asyncio.gather(*(flights.do("task", load) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert flights.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_takes_over_when_leader_is_cancelled():
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def load():
+        started.set()
+        await asyncio.sleep(0.01)
+        return "loaded"
+
+    leader = asyncio.create_task(flights.do("task", load))
+    await started.wait()
+    follower = asyncio.create_task(flights.do("task", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "loaded"
+    assert flights.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_fresh_call_for_later_callers():
+    flights = SingleFlight()
+    versions = iter(["old", "new"])
+
+    async def load():
+        value = next(versions)
+        await asyncio.sleep(0.01)
+        return value
+
+    before = asyncio.create_task(flights.do(("task", 1), load))
+    await asyncio.sleep(0)
+    flights.forget(lambda key: key[1] == 1)
+    after = asyncio.create_task(flights.do(("task", 1), load))
+
+    assert await before == "old"
+    assert await after == "new"
@@ -0,0 +1,125 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.app.task.importer import TaskImporter, read_records
+from src.app.task.repository import TaskRepository
+
+
+def write_ndjson(path, records):
+    path.write_text("".join(line + "\n" for line in records), encoding="utf-8")
+
+
+def make_importer(tmp_path, source, file_format="ndjson", **kwargs):
+    repository = AsyncMock(spec=TaskRepository)
+    # Keeps the progress committed with each chunk, like the task_imports table
+    committed = {}
+
+    async def import_many(rows, progress):
+        committed[progress["source"]] = SimpleNamespace(**progress)
+        return list(range(len(rows)))
+
+    repository.import_many.side_effect = import_many
+    repository.get_import.side_effect = committed.get
+    importer = TaskImporter(
+        repository,
+        str(source),
+        file_format,
+        str(tmp_path / "rejects.ndjson"),
+        str(tmp_path / "checkpoint.json"),
+        batch_size=2,
+        chunk_size=kwargs.pop("chunk_size", 3),
+        **kwargs,
+    )
+    return importer, repository
+
+
+@pytest.mark.asyncio
+async def test_import_commits_chunks_and_writes_rejects(tmp_path):
+    source = tmp_path / "tasks.ndjson"
+    write_ndjson(source, [
+        json.dumps({"title": "First", "description": "One"}),
+        "{broken",
+        json.dumps({"title": "", "description": "Empty title"}),
+        json.dumps({"title": "No description"}),
+        json.dumps({"title": "Second", "description": "Two"}),
+    ])
+    importer, repository = make_importer(tmp_path, source)
+
+    progress = await importer.run()
+
+    inserted = [call.args[0] for call in repository.import_many.await_args_list]
+    assert [[row["title"] for row in rows] for rows in inserted] == [["First"], ["Second"]]
+    assert (progress.imported, progress.rejected) == (2, 3)
+    assert progress.position == source.stat().st_size
+
+    rejects = [json.loads(line) for line in (tmp_path / "rejects.ndjson").read_text().splitlines()]
+    assert [reject["line"] for reject in rejects] == [2, 3, 4]
+    assert rejects[0]["errors"][0]["type"] == "parse_error"
+    assert rejects[1]["errors"][0]["loc"] == ["title"]
+    assert rejects[2]["errors"][0]["loc"] == ["description"]
+    assert progress.rejects_position == (tmp_path / "rejects.ndjson").stat().st_size
+
+    assert await importer.run() == progress
+    assert repository.import_many.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_after_the_last_committed_chunk(tmp_path):
+    source = tmp_path / "tasks.ndjson"
+    write_ndjson(source, [
+        json.dumps({"title": "Task 1", "description": "Text"}),
+        json.dumps({"title": "Task 2", "description": "Text"}),
+        "{broken",
+        json.dumps({"title": "Task 4", "description": "Text"}),
+        json.dumps({"title": "Task 5", "description": "Text"}),
+    ])
+    importer, repository = make_importer(tmp_path, source, chunk_size=2, drop_indexes=True)
+    repository.get_secondary_indexes.return_value = ["CREATE INDEX ix ON tasks (title)"]
+    import_many = repository.import_many.side_effect
+
+    async def fail_second_chunk(rows, progress):
+        if repository.import_many.await_count > 1:
+            raise RuntimeError("disk full")
+        return await import_many(rows, progress)
+
+    repository.import_many.side_effect = fail_second_chunk
+    with pytest.raises(RuntimeError):
+        await importer.run()
+
+    assert importer.load_checkpoint().dropped == ["CREATE INDEX ix ON tasks (title)"]
+    repository.drop_secondary_indexes.assert_awaited_once()
+    repository.restore_secondary_indexes.assert_not_awaited()
+
+    repository.import_many.reset_mock()
+    repository.import_many.side_effect = import_many
+    progress = await importer.run()
+
+    titles = [row["title"] for call in repository.import_many.await_args_list for row in call.args[0]]
+    assert titles == ["Task 4", "Task 5"]
+    assert (progress.imported, progress.rejected) == (4, 1)
+    # The rejects of the failed chunk were cut off and written once more
+    assert len((tmp_path / "rejects.ndjson").read_text().splitlines()) == 1
+    repository.drop_secondary_indexes.assert_awaited_once()
+    repository.restore_secondary_indexes.assert_awaited_once_with(["CREATE INDEX ix ON tasks (title)"])
+    assert importer.load_checkpoint().dropped is None
+
+
+def test_read_csv_tracks_multiline_records(tmp_path):
+    source = tmp_path / "tasks.csv"
+    source.write_bytes(
+        b'\xef\xbb\xbftitle,description\n'
+        b'"Multi","line one\nline two"\n'
+        b'Plain,Text\n'
+    )
+
+    records = list(read_records(str(source), "csv"))
+
+    assert [(record.line, record.record) for record in records] == [
+        (2, {"title": "Multi", "description": "line one\nline two"}),
+        (4, {"title": "Plain", "description": "Text"}),
+    ]
+    resumed = list(read_records(str(source), "csv", records[0].position, 3))
+    assert [(record.line, record.record["title"]) for record in resumed] == [(4, "Plain")]
@@ -1,31 +1,11 @@
-from unittest.mock import AsyncMock, patch
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from src.app.task.repository import TaskRepository
-
-
-@pytest.mark.asyncio
-async def test_get_all(mock_db_session, task_samples):
-    repository = TaskRepository(mock_db_session)
-
-    # Попытка в SQL запрос, ненавижу асинхронные тесты
-    class MockQueryResult:
-        def scalars(self):
-            class MockScalars:
-                def all(self):
-                    return task_samples
-
-            return MockScalars()
-
-    async def mock_execute(*args, **kwargs):
-        return MockQueryResult()
-
-    mock_db_session.execute = mock_execute
-
-    tasks = await repository.get_all()
-
-    assert tasks == task_samples
+from src.app.core.sharding import SHARD_ID_BITS
+from src.app.task.repository import ShardedTaskRepository, TaskRepository
+from src.app.task.schemas import TaskListFilter, TaskSort
 
 
 @pytest.mark.asyncio
@@ -49,6 +29,7 @@ async def test_get_by_id(mock_db_session, task_sample):
     task = await repository.get_by_id(task_id)
 
     assert task == task_sample
+    mock_db_session.close.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -88,6 +69,7 @@ async def test_create(mock_db_session, task_sample, mock_datetime_now):
         mock_db_session.add.assert_called_once_with(task_sample)
         mock_db_session.commit.assert_called_once()
         mock_db_session.refresh.assert_called_once_with(task_sample)
+        mock_db_session.close.assert_awaited_once()
         assert task == task_sample
 
 
@@ -100,15 +82,22 @@ async def test_update(mock_db_session, task_sample, mock_datetime_now):
         "description": "Updated Description"
     }
 
-    mock_execute_result = AsyncMock()
-    mock_db_session.execute = AsyncMock(return_value=mock_execute_result)
+    class MockQueryResult:
+        def scalars(self):
+            class MockScalars:
+                def first(self):
+                    return task_sample
+
+            return MockScalars()
 
-    with patch.object(repository, 'get_by_id', return_value=task_sample):
-        updated_task = await repository.update(task_id, update_data)
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
 
-        mock_db_session.execute.assert_called_once()
-        mock_db_session.commit.assert_called_once()
-        assert updated_task == task_sample
+    updated_task = await repository.update(task_id, update_data)
+
+    mock_db_session.execute.assert_called_once()
+    assert "RETURNING" in str(mock_db_session.execute.call_args.args[0])
+    mock_db_session.commit.assert_called_once()
+    assert updated_task == task_sample
 
 
 @pytest.mark.asyncio
@@ -120,16 +109,24 @@ async def test_update_not_found(mock_db_session, mock_datetime_now):
         "description": "Updated Description"
     }
 
-    with patch.object(repository, 'get_by_id', return_value=None) as mock_get:
-        updated_task = await repository.update(task_id, update_data)
+    class MockQueryResult:
+        def scalars(self):
+            class MockScalars:
+                def first(self):
+                    return None
 
-        assert 'updated_at' in update_data
-        assert update_data['updated_at'] == mock_datetime_now.now.return_value
+            return MockScalars()
 
-        mock_db_session.execute.assert_called_once()
-        mock_db_session.commit.assert_called_once()
-        mock_get.assert_called_once_with(task_id)
-        assert updated_task is None
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    updated_task = await repository.update(task_id, update_data)
+
+    assert 'updated_at' in update_data
+    assert update_data['updated_at'] == mock_datetime_now.now.return_value
+
+    mock_db_session.execute.assert_called_once()
+    mock_db_session.commit.assert_called_once()
+    assert updated_task is None
 
 
 @pytest.mark.asyncio
@@ -137,7 +134,258 @@ async def test_delete(mock_db_session):
     repository = TaskRepository(mock_db_session)
     task_id = 1
 
-    await repository.delete(task_id)
+    class MockQueryResult:
+        def scalars(self):
+            class MockScalars:
+                def first(self):
+                    return task_id
+
+            return MockScalars()
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    deleted = await repository.delete(task_id)
 
     mock_db_session.execute.assert_called_once()
-    mock_db_session.commit.assert_called_once()
\ No newline at end of file
+    assert "RETURNING tasks.id" in str(mock_db_session.execute.call_args.args[0])
+    mock_db_session.commit.assert_called_once()
+    assert deleted is True
+
+
+@pytest.mark.asyncio
+async def test_delete_not_found(mock_db_session):
+    repository = TaskRepository(mock_db_session)
+
+    class MockQueryResult:
+        def scalars(self):
+            class MockScalars:
+                def first(self):
+                    return None
+
+            return MockScalars()
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    deleted = await repository.delete(999)
+
+    assert deleted is False
+
+
+@pytest.mark.asyncio
+async def test_get_page(mock_db_session, task_row_samples):
+    repository = TaskRepository(mock_db_session)
+
+    class MockQueryResult:
+        def keys(self):
+            return list(task_row_samples[0])
+
+        def __iter__(self):
+            return iter([tuple(row.values()) for row in task_row_samples[1:]])
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    tasks = await repository.get_page(limit=2, after=1)
+
+    query = str(mock_db_session.execute.call_args.args[0])
+    assert query.startswith("SELECT tasks.title, tasks.description, tasks.id")
+    assert "tasks.id >" in query
+    assert "ORDER BY tasks.id" in query
+    assert "LIMIT" in query
+    assert tasks == task_row_samples[1:]
+    mock_db_session.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_page_sorted_by_updated_at_desc(mock_db_session):
+    repository = TaskRepository(mock_db_session)
+    filters = TaskListFilter(sort=TaskSort.UPDATED_AT_DESC, updated_from=datetime(2025, 3, 1))
+
+    class MockQueryResult:
+        def keys(self):
+            return []
+
+        def __iter__(self):
+            return iter([])
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    await repository.get_page(limit=2, after=3, filters=filters, after_value=datetime(2025, 3, 2))
+
+    query = str(mock_db_session.execute.call_args.args[0])
+    assert "tasks.updated_at >=" in query
+    assert "(tasks.updated_at, tasks.id) <" in query
+    assert "ORDER BY tasks.updated_at DESC, tasks.id DESC" in query
+
+
+@pytest.mark.asyncio
+async def test_get_fields_by_id(mock_db_session):
+    repository = TaskRepository(mock_db_session)
+
+    class MockQueryResult:
+        def keys(self):
+            return ["id", "title"]
+
+        def first(self):
+            return (1, "Test Task")
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    task = await repository.get_fields_by_id(1, ["id", "title"])
+
+    query = str(mock_db_session.execute.call_args.args[0])
+    assert query.startswith("SELECT tasks.id, tasks.title \nFROM tasks")
+    assert task == {"id": 1, "title": "Test Task"}
+
+
+@pytest.mark.asyncio
+async def test_search(mock_db_session, task_samples):
+    repository = TaskRepository(mock_db_session)
+
+    class MockQueryResult:
+        def all(self):
+            return [(task_samples[0], "<mark>Task</mark> 1")]
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    hits = await repository.search('"task"', limit=10, offset=20, snippets=True)
+
+    query = str(mock_db_session.execute.call_args.args[0])
+    assert "tasks_fts MATCH" in query
+    assert "ORDER BY bm25(tasks_fts" in query
+    assert "snippet(tasks_fts" in query
+    assert hits == [(task_samples[0], "<mark>Task</mark> 1")]
+
+
+@pytest.mark.asyncio
+async def test_create_many(mock_db_session):
+    repository = TaskRepository(mock_db_session)
+    tasks_data = [{"title": f"Task {i}", "description": "Description"} for i in range(5)]
+
+    allocated = MagicMock()
+    allocated.scalar_one.return_value = 12
+    mock_db_session.execute = AsyncMock(side_effect=[allocated, None, None, None])
+
+    with patch('src.app.task.repository.settings.TASKS_BULK_CHUNK_SIZE', 2):
+        ids = await repository.create_many(tasks_data)
+
+    assert ids == [8, 9, 10, 11, 12]
+    assert mock_db_session.execute.call_count == 4
+    assert "UPDATE task_id_sequence" in str(mock_db_session.execute.call_args_list[0].args[0])
+    assert mock_db_session.execute.call_args_list[3].args[1] == [{**tasks_data[4], "id": 12}]
+    mock_db_session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_update_many(mock_db_session, mock_datetime_now):
+    repository = TaskRepository(mock_db_session)
+    patches = {1: {"title": "Done"}, 2: {"title": "Updated 2"}, 3: {"title": "Done"}, 999: {"title": "Done"}}
+
+    shared, single = MagicMock(), MagicMock()
+    shared.scalars.return_value.all.return_value = [1, 3]
+    single.scalars.return_value.all.return_value = [2]
+    mock_db_session.execute = AsyncMock(side_effect=[shared, None, single])
+
+    updated = await repository.update_many(patches)
+
+    assert updated == [1, 3, 2]
+    grouped = mock_db_session.execute.call_args_list[0].args[0]
+    assert "WHERE tasks.id IN" in str(grouped) and "RETURNING tasks.id" in str(grouped)
+    assert grouped.compile().params["title"] == "Done"
+    assert mock_db_session.execute.call_args_list[1].args[1] == [
+        {"title": "Updated 2", "task_id": 2, "updated_at": mock_datetime_now.now.return_value},
+    ]
+    assert "SELECT tasks.id" in str(mock_db_session.execute.call_args_list[2].args[0])
+    mock_db_session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_delete_many(mock_db_session):
+    repository = TaskRepository(mock_db_session)
+
+    class MockQueryResult:
+        def scalars(self):
+            class MockScalars:
+                def all(self):
+                    return [1, 3]
+
+            return MockScalars()
+
+    mock_db_session.execute = AsyncMock(return_value=MockQueryResult())
+
+    deleted = await repository.delete_many([1, 3, 999])
+
+    assert deleted == [1, 3]
+    assert "RETURNING tasks.id" in str(mock_db_session.execute.call_args.args[0])
+    mock_db_session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_create_many_allocates_shard_ids(mock_db_session):
+    repository = TaskRepository(mock_db_session, shard=2)
+    tasks_data = [{"title": f"Task {i}", "description": "Description"} for i in range(3)]
+    first_id = (2 << SHARD_ID_BITS) + 8
+
+    allocated = MagicMock()
+    allocated.scalar_one.return_value = first_id + 2
+    mock_db_session.execute = AsyncMock(side_effect=[allocated, None])
+
+    ids = await repository.create_many(tasks_data)
+
+    assert ids == [first_id, first_id + 1, first_id + 2]
+    assert "UPDATE task_id_sequence" in str(mock_db_session.execute.call_args_list[0].args[0])
+    assert [task["id"] for task in mock_db_session.execute.call_args_list[1].args[1]] == ids
+
+
+def sharded_repository(count):
+    return ShardedTaskRepository([AsyncMock(spec=TaskRepository) for _ in range(count)])
+
+
+@pytest.mark.asyncio
+async def test_sharded_point_operations_use_the_owning_shard(task_sample):
+    repository = sharded_repository(3)
+    task_id = (1 << SHARD_ID_BITS) + 5
+    repository.shards[1].get_by_id.return_value = task_sample
+    repository.shards[1].delete_many.return_value = [task_id]
+    repository.shards[0].delete_many.return_value = []
+
+    assert await repository.get_by_id(task_id) is task_sample
+    assert await repository.get_by_id((7 << SHARD_ID_BITS) + 5) is None
+    assert await repository.delete_many([task_id, 4, 7 << SHARD_ID_BITS]) == [task_id]
+
+    repository.shards[1].get_by_id.assert_called_once_with(task_id)
+    repository.shards[0].delete_many.assert_called_once_with([4])
+    repository.shards[1].delete_many.assert_called_once_with([task_id])
+    repository.shards[2].delete_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sharded_get_page_merges_shard_pages():
+    repository = sharded_repository(2)
+    repository.shards[0].get_page.return_value = [
+        {"description": "a", "id": 1, "title": "d"},
+        {"description": "b", "id": 3, "title": "b"},
+    ]
+    repository.shards[1].get_page.return_value = [
+        {"description": "c", "id": (1 << SHARD_ID_BITS) + 1, "title": "c"},
+        {"description": "d", "id": (1 << SHARD_ID_BITS) + 2, "title": "a"},
+    ]
+    filters = TaskListFilter(sort=TaskSort.TITLE_DESC)
+
+    rows = await repository.get_page(3, filters=filters, fields=("description",))
+
+    assert rows == [{"description": "a"}, {"description": "c"}, {"description": "b"}]
+    for shard in repository.shards:
+        shard.get_page.assert_called_once_with(3, None, filters, None, ("description", "id", "title"))
+
+
+@pytest.mark.asyncio
+async def test_sharded_search_merges_by_rank(task_samples):
+    repository = sharded_repository(2)
+    first, second, third = task_samples
+    repository.shards[0].search_ranked.return_value = [(first, None, -3.0), (third, None, -1.0)]
+    repository.shards[1].search_ranked.return_value = [(second, None, -2.0)]
+
+    hits = await repository.search('"task"', limit=2, offset=1)
+
+    assert hits == [(second, None), (third, None)]
+    repository.shards[1].search_ranked.assert_called_once_with('"task"', 3, 0, False)
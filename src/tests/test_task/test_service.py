@@ -1,24 +1,225 @@
-from unittest.mock import patch
+import asyncio
+import typing
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi import HTTPException
+from pydantic import TypeAdapter
 from unittest.mock import ANY
 
+from src.app.core.cache import LRUCache
+from src.app.core.config import settings
+from src.app.core.events import EventBroker
 from src.app.core.mapper import DTOMapper
-from src.app.task.schemas import TaskCreate, TaskUpdate
+from src.app.core.singleflight import SingleFlight
+from src.app.task.schemas import TaskCreate, TaskUpdate, TaskBulkUpdateItem, TaskListFilter, TaskSort, TaskResponse
+from src.app.task.repository import TaskRepository
 from src.app.task.service import TaskService
 
 
 @pytest.mark.asyncio
-async def test_get_all_tasks(mock_task_repository, task_samples):
+async def test_get_tasks_page(mock_task_repository, task_row_samples):
     service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples
 
-    with patch.object(DTOMapper, 'tasks_to_responses', return_value=task_samples) as mock_mapper:
-        tasks = await service.get_all_tasks()
+    page = await service.get_tasks_page(limit=2)
 
-        mock_task_repository.get_all.assert_called_once()
-        mock_mapper.assert_called_once_with(task_samples)
-        assert tasks == task_samples
+    mock_task_repository.get_page.assert_called_once_with(3, None, ANY, None, None)
+    assert [task["id"] for task in page.items] == [1, 2]
+    assert page.next_cursor == 2
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_last(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples[2:]
+
+    page = await service.get_tasks_page(limit=2, after=2)
+
+    mock_task_repository.get_page.assert_called_once_with(3, 2, ANY, None, None)
+    assert [task["id"] for task in page.items] == [3]
+    assert page.next_cursor is None
+
+
+def test_rows_to_json_matches_response_model(task_samples, task_row_samples):
+    expected = TypeAdapter(typing.List[TaskResponse]).dump_json(DTOMapper.tasks_to_responses(task_samples))
+
+    assert DTOMapper.rows_to_json(task_row_samples) == expected
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_sorted_by_title(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples
+
+    page = await service.get_tasks_page(limit=2, after=5, filters=TaskListFilter(sort=TaskSort.TITLE), after_value="Task 0")
+
+    mock_task_repository.get_page.assert_called_once_with(3, 5, ANY, "Task 0", None)
+    assert page.next_cursor == 2
+    assert page.next_cursor_value == "Task 2"
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_sort_inferred_from_range(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples[:1]
+    filters = TaskListFilter(created_from=datetime(2025, 3, 1))
+
+    await service.get_tasks_page(limit=2, filters=filters)
+
+    assert mock_task_repository.get_page.call_args.args[2].sort == TaskSort.CREATED_AT
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_rejects_range_off_sort_field(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    filters = TaskListFilter(sort=TaskSort.UPDATED_AT_DESC, created_from=datetime(2025, 3, 1))
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.get_tasks_page(limit=2, filters=filters)
+
+    assert excinfo.value.status_code == 400
+    mock_task_repository.get_page.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_requires_after_value(mock_task_repository):
+    service = TaskService(mock_task_repository)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.get_tasks_page(limit=2, after=3, filters=TaskListFilter(sort=TaskSort.CREATED_AT))
+
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_selects_requested_fields(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples
+    filters = TaskListFilter(sort=TaskSort.TITLE)
+
+    page = await service.get_tasks_page(limit=2, filters=filters, fields=("id",))
+
+    columns = mock_task_repository.get_page.call_args.args[4]
+    assert columns == ("title", "id", "updated_at")
+    assert page.fields == ("id",)
+    assert DTOMapper.rows_to_json(page.items, page.fields) == b'[{"id":1},{"id":2}]'
+
+
+def test_parse_fields():
+    assert TaskService.parse_fields(None) is None
+    assert TaskService.parse_fields("updated_at, id,title") == ("title", "id", "updated_at")
+    assert TaskService.parse_fields("title,description,id,created_at,updated_at") is None
+
+    with pytest.raises(HTTPException) as excinfo:
+        TaskService.parse_fields("id,secret")
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_task_fields(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_fields_by_id.return_value = task_row_samples[0]
+
+    task = await service.get_task_fields(1, ("title",))
+
+    mock_task_repository.get_fields_by_id.assert_called_once_with(1, ("title", "id", "updated_at"))
+    assert DTOMapper.row_to_json(task, ("title",)) == b'{"title":"Task 1"}'
+
+
+@pytest.mark.asyncio
+async def test_get_task_fields_from_cache(mock_task_repository, task_samples):
+    service = TaskService(mock_task_repository, cache=LRUCache(max_size=10, ttl=30))
+    await service.get_task_by_id(2)
+
+    task = await service.get_task_fields(2, ("title",))
+
+    mock_task_repository.get_fields_by_id.assert_not_called()
+    assert task == {"title": "Task 2", "id": 2, "updated_at": task_samples[1].updated_at}
+
+
+@pytest.mark.asyncio
+async def test_search_tasks(mock_task_repository, task_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.search.return_value = [(task, None) for task in task_samples]
+
+    page = await service.search_tasks("task", limit=2, offset=4)
+
+    mock_task_repository.search.assert_called_once_with('"task"', 3, 4, False)
+    assert [task.id for task in page.items] == [1, 2]
+    assert page.next_offset == 6
+
+
+@pytest.mark.asyncio
+async def test_search_tasks_stops_linking_past_the_max_offset(mock_task_repository, task_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.search.return_value = [(task, None) for task in task_samples]
+
+    with patch.object(settings, "TASKS_SEARCH_MAX_OFFSET", 5):
+        last = await service.search_tasks("task", limit=2, offset=3)
+        past = await service.search_tasks("task", limit=2, offset=4)
+
+    assert last.next_offset == 5
+    assert past.next_offset is None
+    assert [task.id for task in past.items] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_search_tasks_without_terms(mock_task_repository):
+    service = TaskService(mock_task_repository)
+
+    page = await service.search_tasks("* **", limit=10)
+
+    mock_task_repository.search.assert_not_called()
+    assert page.items == []
+    assert page.next_offset is None
+
+
+def test_match_expression_quotes_terms():
+    assert TaskService._match_expression('buy "milk" NEAR(') == '"buy" """milk""" "NEAR("'
+    assert TaskService._match_expression("rep*") == '"rep"*'
+
+
+@pytest.mark.asyncio
+async def test_get_tasks_page_version_matches_page(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_page.return_value = task_row_samples
+    mock_task_repository.get_page_fingerprint.return_value = (
+        3, max(task["updated_at"] for task in task_row_samples), 6
+    )
+
+    page = await service.get_tasks_page(limit=2)
+    version = await service.get_tasks_page_version(limit=2)
+
+    mock_task_repository.get_page_fingerprint.assert_called_once_with(3, None, ANY, None)
+    assert version == page.version
+
+
+@pytest.mark.asyncio
+async def test_get_task_updated_at_not_found(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_updated_at.return_value = None
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.get_task_updated_at(999)
+
+    assert excinfo.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_export_tasks(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+
+    async def stream_all():
+        yield task_row_samples[:2]
+        yield task_row_samples[2:]
+
+    mock_task_repository.stream_all = stream_all
+
+    batches = [batch async for batch in service.export_tasks()]
+
+    assert [[task["id"] for task in batch] for batch in batches] == [[1, 2], [3]]
 
 
 @pytest.mark.asyncio
@@ -36,6 +237,98 @@ async def test_get_task_by_id(mock_task_repository, task_sample):
         assert task == task_sample
 
 
+@pytest.mark.asyncio
+async def test_get_task_by_id_cached(mock_task_repository, task_sample):
+    service = TaskService(mock_task_repository, cache=LRUCache(max_size=10, ttl=30))
+    mock_task_repository.get_by_id.return_value = task_sample
+
+    first = await service.get_task_by_id(1)
+    second = await service.get_task_by_id(1)
+
+    mock_task_repository.get_by_id.assert_called_once_with(1)
+    assert second is first
+
+
+@pytest.mark.asyncio
+async def test_update_task_invalidates_cache(mock_task_repository, task_sample):
+    service = TaskService(mock_task_repository, cache=LRUCache(max_size=10, ttl=30))
+    mock_task_repository.get_by_id.return_value = task_sample
+
+    await service.get_task_by_id(1)
+    await service.update_task(1, TaskUpdate(title="Updated Task", description="Updated Description"))
+    await service.get_task_by_id(1)
+
+    assert mock_task_repository.get_by_id.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_task_by_id_share_one_query(mock_task_repository, task_sample):
+    service = TaskService(mock_task_repository, flights=SingleFlight())
+
+    async def get_by_id(task_id):
+        await asyncio.sleep(0.01)
+        return task_sample
+
+    mock_task_repository.get_by_id.side_effect = get_by_id
+
+    responses = await asyncio.gather(*(service.get_task_by_id(1) for _ in range(5)))
+
+    mock_task_repository.get_by_id.assert_called_once_with(1)
+    assert all(response is responses[0] for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_writes_publish_change_events(mock_task_repository):
+    events = EventBroker(buffer_size=10, history_size=10, max_subscribers=10)
+    service = TaskService(mock_task_repository, events=events)
+    subscription = events.subscribe()
+    mock_task_repository.delete_many.return_value = [1, 3]
+
+    await service.update_task(1, TaskUpdate(title="Updated Task", description="Updated Description"))
+    await service.delete_tasks([1, 2, 3])
+
+    frames = [(await subscription.next(timeout=1)).frame for _ in range(3)]
+    assert b"event: updated" in frames[0] and b'"title":"Test Task"' in frames[0]
+    assert frames[1].endswith(b'event: deleted\ndata: {"id":1}\n\n')
+    assert frames[2].endswith(b'event: deleted\ndata: {"id":3}\n\n')
+
+
+def test_stream_changes_rejects_bad_positions(mock_task_repository):
+    events = EventBroker(buffer_size=10, history_size=10, max_subscribers=1)
+    service = TaskService(mock_task_repository, events=events)
+
+    with pytest.raises(HTTPException) as excinfo:
+        service.stream_changes("latest")
+    assert excinfo.value.status_code == 400
+
+    # Nothing subscribes until the response body starts
+    service.stream_changes(events.position())
+    assert events.stats()["subscribers"] == 0
+
+    events.subscribe()
+    with pytest.raises(HTTPException) as excinfo:
+        service.stream_changes()
+    assert excinfo.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_write_forgets_in_flight_pages(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository, flights=SingleFlight())
+
+    async def get_page(*args):
+        await asyncio.sleep(0.01)
+        return task_row_samples
+
+    mock_task_repository.get_page.side_effect = get_page
+
+    before = asyncio.create_task(service.get_tasks_page(10))
+    await asyncio.sleep(0)
+    await service.update_task(1, TaskUpdate(title="Updated Task", description="Updated Description"))
+    await asyncio.gather(before, service.get_tasks_page(10))
+
+    assert mock_task_repository.get_page.call_count == 2
+
+
 @pytest.mark.asyncio
 async def test_get_task_by_id_not_found(mock_task_repository):
     service = TaskService(mock_task_repository)
@@ -65,24 +358,39 @@ async def test_create_task(mock_task_repository, task_sample):
             assert task == task_sample
 
 
+@pytest.mark.asyncio
+async def test_create_tasks(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    tasks_data = [TaskCreate(title="Task 1", description="Description 1"),
+                  TaskCreate(title="Task 2", description="Description 2")]
+    mock_task_repository.create_many.return_value = [7, 8]
+
+    ids = await service.create_tasks(tasks_data)
+
+    mock_task_repository.create_many.assert_called_once_with([
+        {"title": "Task 1", "description": "Description 1"},
+        {"title": "Task 2", "description": "Description 2"},
+    ])
+    assert ids == [7, 8]
+
+
 @pytest.mark.asyncio
 async def test_update_task(mock_task_repository, task_sample):
     service = TaskService(mock_task_repository)
     task_id = 1
     update_data = TaskUpdate(title="Updated Task", description="Updated Description")
 
-    with patch.object(service, 'get_task_by_id', return_value=True) as mock_get:
-        with patch.object(DTOMapper, 'update_dto_to_dict',
-                          return_value={"title": "Updated Task", "description": "Updated Description"}) as mock_to_dict:
-            with patch.object(DTOMapper, 'task_to_response', return_value=task_sample) as mock_to_response:
-                updated_task = await service.update_task(task_id, update_data)
+    with patch.object(DTOMapper, 'update_dto_to_dict',
+                      return_value={"title": "Updated Task", "description": "Updated Description"}) as mock_to_dict:
+        with patch.object(DTOMapper, 'task_to_response', return_value=task_sample) as mock_to_response:
+            updated_task = await service.update_task(task_id, update_data)
 
-                mock_get.assert_called_once_with(task_id)
-                mock_to_dict.assert_called_once_with(update_data)
-                mock_task_repository.update.assert_called_once_with(task_id, {"title": "Updated Task",
-                                                                              "description": "Updated Description"})
-                mock_to_response.assert_called_once_with(task_sample)
-                assert updated_task == task_sample
+            mock_to_dict.assert_called_once_with(update_data)
+            mock_task_repository.get_by_id.assert_not_called()
+            mock_task_repository.update.assert_called_once_with(task_id, {"title": "Updated Task",
+                                                                          "description": "Updated Description"})
+            mock_to_response.assert_called_once_with(task_sample)
+            assert updated_task == task_sample
 
 
 @pytest.mark.asyncio
@@ -91,15 +399,11 @@ async def test_update_task_not_found(mock_task_repository):
     task_id = 999
     update_data = TaskUpdate(title="Updated Task", description="Updated Description")
 
-    with patch.object(service, 'get_task_by_id') as mock_get:
-        mock_get.side_effect = HTTPException(status_code=404, detail="Task not found")
-
-        with pytest.raises(HTTPException) as excinfo:
-            await service.update_task(task_id, update_data)
+    with pytest.raises(HTTPException) as excinfo:
+        await service.update_task(task_id, update_data)
 
-        assert excinfo.value.status_code == 404
-        mock_get.assert_called_once_with(task_id)
-        mock_task_repository.update.assert_not_called()
+    assert excinfo.value.status_code == 404
+    mock_task_repository.update.assert_called_once()
 
 
 @pytest.mark.asyncio
@@ -107,11 +411,10 @@ async def test_delete_task(mock_task_repository):
     service = TaskService(mock_task_repository)
     task_id = 1
 
-    with patch.object(service, 'get_task_by_id', return_value=True) as mock_get:
-        await service.delete_task(task_id)
+    await service.delete_task(task_id)
 
-        mock_get.assert_called_once_with(task_id)
-        mock_task_repository.delete.assert_called_once_with(task_id)
+    mock_task_repository.get_by_id.assert_not_called()
+    mock_task_repository.delete.assert_called_once_with(task_id)
 
 
 @pytest.mark.asyncio
@@ -119,12 +422,98 @@ async def test_delete_task_not_found(mock_task_repository):
     service = TaskService(mock_task_repository)
     task_id = 999
 
-    with patch.object(service, 'get_task_by_id') as mock_get:
-        mock_get.side_effect = HTTPException(status_code=404, detail="Task not found")
+    with pytest.raises(HTTPException) as excinfo:
+        await service.delete_task(task_id)
+
+    assert excinfo.value.status_code == 404
+    mock_task_repository.delete.assert_called_once_with(task_id)
 
-        with pytest.raises(HTTPException) as excinfo:
-            await service.delete_task(task_id)
 
-        assert excinfo.value.status_code == 404
-        mock_get.assert_called_once_with(task_id)
-        mock_task_repository.delete.assert_not_called()
\ No newline at end of file
+@pytest.mark.asyncio
+async def test_update_tasks(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    tasks_data = [TaskBulkUpdateItem(id=1, title="Updated 1"),
+                  TaskBulkUpdateItem(id=999, title="Updated 999", description="Updated Description")]
+    mock_task_repository.update_many.return_value = [1]
+
+    result = await service.update_tasks(tasks_data)
+
+    mock_task_repository.update_many.assert_called_once_with({
+        1: {"title": "Updated 1"},
+        999: {"title": "Updated 999", "description": "Updated Description"},
+    })
+    assert result.ids == [1]
+    assert result.missing == [999]
+
+
+@pytest.mark.asyncio
+async def test_delete_tasks(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.delete_many.return_value = [3, 1]
+
+    result = await service.delete_tasks([1, 3, 3, 999])
+
+    mock_task_repository.delete_many.assert_called_once_with([1, 3, 999])
+    assert result.ids == [1, 3]
+    assert result.missing == [999]
+
+
+@pytest.mark.asyncio
+async def test_get_changes_merges_updates_and_deletions(mock_task_repository, task_row_samples):
+    service = TaskService(mock_task_repository)
+    for seq, row in zip((4, 6, 7), task_row_samples):
+        row["change_seq"] = seq
+    mock_task_repository.get_sync_state.return_value = (9, 2)
+    mock_task_repository.get_changes.return_value = (task_row_samples, [(8, 5)])
+
+    changes = await service.get_changes(since="3", limit=3)
+
+    mock_task_repository.get_changes.assert_called_once_with(3, 9, 4, True)
+    assert [task.id for task in changes.items] == [1, 2]
+    assert changes.deleted == [8]
+    assert changes.next_token == "6"
+    assert changes.has_more
+
+    mock_task_repository.get_changes.return_value = ([], [(8, 5)])
+    changes = await service.get_changes(since="6", limit=3)
+
+    assert changes.deleted == [8]
+    assert changes.next_token == "9"
+    assert not changes.has_more
+
+
+@pytest.mark.asyncio
+async def test_get_changes_rejects_stale_and_invalid_tokens(mock_task_repository):
+    service = TaskService(mock_task_repository)
+    mock_task_repository.get_sync_state.return_value = (9, 5)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.get_changes(since="4", limit=10)
+    assert excinfo.value.status_code == 410
+
+    with pytest.raises(HTTPException) as excinfo:
+        await service.get_changes(since="-1", limit=10)
+    assert excinfo.value.status_code == 400
+    mock_task_repository.get_changes.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_changes_keeps_a_position_per_shard(mock_task_repository, task_row_samples):
+    first, second = AsyncMock(spec=TaskRepository), AsyncMock(spec=TaskRepository)
+    mock_task_repository.shards = [first, second]
+    service = TaskService(mock_task_repository)
+    for seq, row in zip((4, 5, 2), task_row_samples):
+        row["change_seq"] = seq
+    first.get_sync_state.return_value = (9, 0)
+    first.get_changes.return_value = (task_row_samples[:2], [])
+    second.get_sync_state.return_value = (3, 0)
+    second.get_changes.return_value = (task_row_samples[2:], [(7, 3)])
+
+    changes = await service.get_changes(since="3", limit=3)
+
+    # The token predates the second shard, which is read from the start
+    second.get_changes.assert_called_once_with(0, 3, 4, True)
+    assert [task.id for task in changes.items] == [3, 1]
+    assert changes.deleted == [7]
+    assert changes.next_token == "4.3"
+    assert changes.has_more